@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+asyncio-Schnittstelle für die Elmo L-12, z.B. für Webdienste oder Raumsteuerungen.
+Alle pyusb-Zugriffe laufen nacheinander in genau einem eigenen Thread, die
+Ereignisschleife wird nie blockiert. Bilder holt eine einzige Aufgabe, solange
+mindestens ein Empfänger frames() durchläuft; jeder Empfänger erhält stets das
+neueste Bild, langsame Empfänger überspringen Bilder statt sie anzusammeln.
+Befehle (Zoom, Helligkeit, Autofokus, Einzelbild) werden zwischen zwei Bildern
+ausgeführt.
+
+Beispiel:
+    async with AsyncElmo() as cam:
+        await cam.connect()
+        await cam.zoom(1)
+        async for frame in cam.frames():
+            ...
+        data = await cam.snapshot(quality=95)
+"""
+
+import argparse
+import asyncio
+import functools
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import elmoCam
+
+
+class AsyncElmo:
+    ''' asyncio-Fassade für eine elmoCam.Elmo-Instanz cam (Standard: neue Instanz).
+    interval ist der minimale Abstand zwischen zwei Bildanforderungen in Sekunden.'''
+    def __init__(self, cam=None, interval=0):
+        self.cam = cam if cam is not None else elmoCam.Elmo()
+        self.interval = interval
+        self.failed = False # True falls letzte Bildanforderung fehlgeschlagen
+        self.frames_captured = 0
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='ElmoAsync') # USB nur aus diesem Thread
+        self._frame = None
+        self._seq = 0
+        self._cond = None # asyncio.Condition, in der laufenden Ereignisschleife angelegt
+        self._consumers = 0
+        self._task = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _run(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def connect(self, **kwargs):
+        ''' wie Elmo.connect(), liefert -1 falls keine Kamera gefunden wurde'''
+        return await self._run(self.cam.connect, **kwargs)
+
+    async def zoom(self, i):
+        return await self._run(self.cam.zoom, i)
+
+    async def brightness(self, i):
+        return await self._run(self.cam.brightness, i)
+
+    async def autofocus(self):
+        return await self._run(self.cam.autofocus)
+
+    async def version(self):
+        return await self._run(self.cam.version)
+
+    async def snapshot(self, quality=80):
+        ''' Einzelbild mit mind. der jpg-Qualität quality (JPEG-Bytes oder False)'''
+        return await self._run(self.cam.snapshot, quality)
+
+    def set_compression(self, compression):
+        self.cam.setCompression(compression) # wirkt ab der nächsten Bildanforderung
+
+    async def frames(self):
+        ''' Neue Bilder als JPEG-Bytes, bei langsamer Verarbeitung nur das jeweils neueste.
+        Vorzeitig beenden mit contextlib.aclosing() oder break (Aufräumen dann durch asyncio).'''
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        self._consumers += 1
+        if self._task is None:
+            self._task = asyncio.create_task(self._capture())
+        seq = self._seq
+        try:
+            while True:
+                async with self._cond:
+                    await self._cond.wait_for(lambda: self._seq > seq)
+                    seq, frame = self._seq, self._frame
+                yield frame
+        finally:
+            self._consumers -= 1
+
+    async def _capture(self):
+        ''' Bilder holen, solange es Empfänger gibt'''
+        try:
+            while self._consumers > 0:
+                start = time.monotonic()
+                try:
+                    data = await self._run(self.cam.get_image)
+                except Exception as e:
+                    logging.warning('elmoAsync: get_image() exception: {}'.format(e))
+                    data = False
+                self.failed = not data
+                if data:
+                    self.frames_captured += 1
+                    async with self._cond:
+                        self._frame = data
+                        self._seq += 1
+                        self._cond.notify_all()
+                wait = (self.interval if data else 0.05) - (time.monotonic() - start)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+        finally:
+            self._task = None
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+
+async def _demo(args):
+    async with AsyncElmo() as cam:
+        if await cam.connect(**elmoCam.connect_args(args)) == -1:
+            sys.exit('Keine Elmo L-12 Kamera gefunden.')
+        cam.set_compression(args.compression)
+        start = time.monotonic()
+        count = 0
+        async for frame in cam.frames():
+            count += 1
+            if count >= args.frames:
+                break
+        print('{} frames in {:.2f} s'.format(count, time.monotonic()-start))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bildrate der Elmo L-12 über die asyncio-Schnittstelle messen')
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--compression', type=int, default=60, help='JPEG-Kompression 10-100')
+    elmoCam.add_arguments(parser)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_demo(args))
+
+
+if __name__ == '__main__':
+    main()
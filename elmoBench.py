@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark der gesamten Bildkette von elmoUi ohne Bildschirm:
+USB-Anforderung, Lesen der Portionen, Zusammensetzen (elmoCam.Elmo.get_image()),
+Decodierung, Skalierung, Overlay und Darstellung (elmoUi/elmoDecode).
+Gemessen wird gegen die simulierte Kamera aus elmoSim, mit --hardware
+gegen eine angeschlossene Elmo L-12 oder mit --replay gegen eine Aufzeichnung
+(elmoTrace) einer echten Kamera, jeweils für alle Kombinationen aus
+Kompressionswerten und Fenstergrößen.
+
+Ausgabe: je Kombination eine JSON-Zeile mit Bildern/s, Latenz (p50/p95/p99)
+und Wand-/CPU-Zeit je Abschnitt, z.B. zum Vergleich zweier Versionen:
+    python3 elmoBench.py --frames 100 --output bench_output.txt
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # kein Fenster nötig
+import pygame
+import elmoCam
+import elmoDecode
+import elmoUi
+
+STAGES = ['request', 'read', 'reassembly', 'decode', 'resize', 'overlay', 'present']
+
+
+def percentile(values, p):
+    ''' p-Perzentil (0..100) einer Liste, nächster Rang'''
+    if not values:
+        return None
+    values = sorted(values)
+    k = max(0, min(len(values)-1, math.ceil(p/100*len(values))-1))
+    return values[k]
+
+
+def parse_size(text):
+    w, h = text.lower().split('x')
+    return (int(w), int(h))
+
+
+class StageTimer:
+    ''' Sammelt je Abschnitt Wand- und CPU-Zeit pro Bild'''
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+
+    def add(self, stage, wall, cpu):
+        self.samples[stage].append((wall, cpu))
+
+    def measure(self, stage, func, *args):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        result = func(*args)
+        self.add(stage, time.perf_counter()-wall, time.thread_time()-cpu)
+        return result
+
+    def summary(self):
+        result = {}
+        for stage, samples in self.samples.items():
+            walls = [s[0]*1000 for s in samples]
+            cpus = [s[1]*1000 for s in samples]
+            result[stage] = {
+                'wall_ms_mean': sum(walls)/len(walls) if walls else None,
+                'wall_ms_p95': percentile(walls, 95),
+                'cpu_ms_mean': sum(cpus)/len(cpus) if cpus else None,
+            }
+        return result
+
+
+def run(cam, compression, window_size, frames, warmup=3):
+    ''' frames Bilder mit gegebener Kompression in ein Fenster der Größe window_size darstellen'''
+    cam.setCompression(compression)
+    screen = pygame.display.set_mode(window_size)
+    overlay = elmoUi.OverlayCache()
+    timer = StageTimer()
+    latencies = []
+    sizes = []
+    failed = 0
+    start = None
+    for i in range(frames+warmup):
+        if i == warmup: # Einschwingen (JPEG-Cache, Fonts) nicht mitmessen
+            timer = StageTimer()
+            latencies = []
+            sizes = []
+            failed = 0
+            start = time.perf_counter()
+        t0 = time.perf_counter()
+        data = cam.get_image()
+        if not data:
+            failed += 1
+            continue
+        for stage in ('request', 'read', 'reassembly'):
+            timer.add(stage, *cam.timing.get(stage, (0.0, 0.0)))
+        sizes.append(len(data))
+        pic, size = timer.measure('decode', elmoDecode.load_jpeg, data, screen.get_size())
+        image = timer.measure('resize', elmoDecode.scale_to_surface, pic, size)
+        def draw_overlay():
+            screen.fill(elmoUi.BLACK)
+            screen.blit(image, elmoUi.get_image_padding(image, screen))
+            layers, buttons = overlay.get(screen.get_size(), False, True, False)
+            screen.blits(layers, doreturn=False)
+        timer.measure('overlay', draw_overlay)
+        timer.measure('present', pygame.display.update)
+        latencies.append((time.perf_counter()-t0)*1000)
+    elapsed = time.perf_counter()-start
+    return {
+        'compression': compression,
+        'window': '{}x{}'.format(*window_size),
+        'frames': len(latencies),
+        'failed': failed,
+        'fps': len(latencies)/elapsed if elapsed else None,
+        'frame_bytes_mean': sum(sizes)/len(sizes) if sizes else None,
+        'latency_ms_p50': percentile(latencies, 50),
+        'latency_ms_p95': percentile(latencies, 95),
+        'latency_ms_p99': percentile(latencies, 99),
+        'stages': timer.summary(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark der Elmo-Bildkette')
+    parser.add_argument('--frames', type=int, default=50, help='Bilder je Messung')
+    parser.add_argument('--compression', default='10,20,30,40,50,60,70,80,90,100', help='Kompressionswerte, kommagetrennt')
+    parser.add_argument('--window', default='640x480,1280x960,1920x1080', help='Fenstergrößen, kommagetrennt')
+    elmoCam.add_arguments(parser, sim_default=True)
+    parser.add_argument('--speed', type=float, default=1.0, help='Geschwindigkeit der Wiedergabe, 0 = ohne Wartezeiten')
+    parser.add_argument('--sim-size', default='1280x960', help='Bildgröße der simulierten Kamera')
+    parser.add_argument('--sim-latency', type=float, default=0.0, help='Latenz pro USB-Lesevorgang in s')
+    parser.add_argument('--sim-bandwidth', type=float, default=None, help='USB-Bandbreite in Bytes/s')
+    parser.add_argument('--sim-prepare', type=float, default=0.0, help='Zeit der Kamera bis zum Senden eines Bildes in s')
+    parser.add_argument('--pipelined', action='store_true', help='Portionen mit einem Lesevorgang, nächstes Bild vorab anfordern')
+    parser.add_argument('--output', default=None, help='JSON-Zeilen an Datei anhängen statt auf stdout')
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    cam = elmoCam.open_from_args(args, sim=dict(size=parse_size(args.sim_size), latency=args.sim_latency, bandwidth=args.sim_bandwidth, prepare=args.sim_prepare),
+                                 replay=dict(speed=args.speed, loop=True))
+    source = 'replay' if args.replay else 'sim' if args.sim else 'hardware'
+    cam.pipelined = args.pipelined
+    out = open(args.output, 'a') if args.output else sys.stdout
+    try:
+        for window in [parse_size(w) for w in args.window.split(',')]:
+            for compression in [int(c) for c in args.compression.split(',')]:
+                result = run(cam, compression, window, args.frames)
+                result['source'] = source
+                result['pipelined'] = args.pipelined
+                out.write(json.dumps(result)+'\n')
+                out.flush()
+                if result['frames']:
+                    print('{window} compression {compression}: {fps:.1f} fps, p95 {latency_ms_p95:.1f} ms'.format(**result), file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,425 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Gemeinsame Nutzung einer Elmo L-12 durch mehrere Programme auf demselben Rechner.
+Nur ein Prozess kann die USB-Schnittstelle belegen. Der Dienst (python3 elmoBus.py)
+verbindet sich mit der Kamera und legt jedes Bild in einem Ringpuffer im Shared
+Memory (multiprocessing.shared_memory) mit fortlaufender Nummer ab. Beliebig viele
+Clients (elmoUi --bus, Aufnahme, Auswerteskripte) lesen das neueste Bild direkt aus
+dem gemeinsamen Speicher, ohne Kopie über Sockets. Kamerabefehle (Zoom, Helligkeit,
+Autofokus, Kompression, Einzelbild) schicken Clients über einen lokalen Socket an den
+Dienst, der sie wie elmoUi zwischen zwei Bildern ausführt. Socket und Schlüssel für
+die Anmeldung (authkey) liegen in einem nur für den Benutzer zugänglichen Verzeichnis.
+
+Aufbau des Speichers: Kopf (Kennung, Anzahl Plätze, Platzgröße, neueste Nummer,
+Zustand der Kamera), dann je Platz Nummer, Länge, Zeitstempel und JPEG-Bytes.
+Ein Platz wird beim Schreiben zuerst ungültig markiert (Nummer 0), Leser prüfen die
+Nummer vor und nach dem Lesen (Seqlock) und erkennen so überschriebene Bilder.
+
+Aufruf:
+    python3 elmoBus.py --name elmo             # Dienst
+    python3 elmoUi.py --bus elmo               # Anzeige als Client
+    python3 elmoBus.py --name elmo --watch     # Bildnummern und -größen ausgeben
+"""
+
+import argparse
+import logging
+import os
+import signal
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import AuthenticationError, resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+import elmoCapture
+
+MAGIC = b'ELMB'
+HEADER = struct.Struct('<4sIIQ??B') # Kennung, Plätze, Platzgröße, neueste Nummer, zooming, brightnessing, Kompression
+SLOT = struct.Struct('<QId') # Nummer, Länge, Zeitstempel
+COMMANDS = {'zoom', 'brightness', 'autobrightness', 'autofocus', 'version', 'snapshot', 'setCompression', 'getCompression', 'autoCompression'}
+
+
+def control_dir():
+    ''' Verzeichnis für Socket und Schlüssel, nur für den Benutzer zugänglich (0700)'''
+    path = os.path.join(tempfile.gettempdir(), 'elmoBus-{}'.format(os.getuid()))
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError('elmoBus: {} is not a private directory'.format(path))
+    return path
+
+
+def control_address(name):
+    ''' Unix-Socket für Kamerabefehle des Dienstes name'''
+    return os.path.join(control_dir(), '{}.sock'.format(name))
+
+
+def key_path(name):
+    ''' Datei mit dem Schlüssel (authkey) für den Socket des Dienstes name'''
+    return os.path.join(control_dir(), '{}.key'.format(name))
+
+
+def _write_key(name):
+    ''' Neuen zufälligen Schlüssel anlegen, Datei nur für den Benutzer lesbar (0600)'''
+    key = os.urandom(32)
+    path = key_path(name)
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+def _read_key(name):
+    with open(key_path(name), 'rb') as f:
+        return f.read()
+
+
+def running(name):
+    ''' True falls der Dienst name läuft, d.h. auf seinem Socket antwortet'''
+    address = control_address(name)
+    if not os.path.exists(address):
+        return False
+    try:
+        key = _read_key(name)
+    except OSError: # Schlüssel fehlt > jeder Schlüssel wird abgelehnt, Antwort zählt trotzdem
+        key = os.urandom(32)
+    try:
+        conn = Client(address, 'AF_UNIX', authkey=key)
+    except AuthenticationError:
+        return True
+    except (OSError, EOFError): # niemand nimmt an > Rest eines beendeten Dienstes
+        return False
+    conn.close()
+    return True
+
+
+def _attach(name):
+    ''' Bestehenden Speicher öffnen, ohne dass er beim Beenden des Clients freigegeben wird'''
+    try:
+        return SharedMemory(name, track=False) # ab Python 3.13
+    except TypeError:
+        shm = SharedMemory(name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class FrameBus:
+    ''' Ringpuffer für JPEG-Bilder im Shared Memory name.
+    create=True legt ihn an (Dienst) mit slots Plätzen zu je slot_size Bytes, sonst wird ein
+    bestehender Puffer geöffnet (Client). Ein vorhandener Puffer gleichen Namens wird dabei
+    ersetzt, vorher mit running() prüfen, dass kein Dienst ihn verwendet. publish() kann direkt als Listener eines
+    CaptureThread verwendet werden.'''
+    def __init__(self, name='elmo', create=False, slots=8, slot_size=4*1024*1024):
+        self.name = name
+        self.owner = create
+        if create:
+            size = HEADER.size + slots*(SLOT.size+slot_size)
+            try:
+                self._shm = SharedMemory(name, create=True, size=size)
+            except FileExistsError: # Rest eines abgestürzten Dienstes (s. running())
+                old = _attach(name)
+                old.close()
+                old.unlink()
+                self._shm = SharedMemory(name, create=True, size=size)
+            HEADER.pack_into(self._shm.buf, 0, MAGIC, slots, slot_size, 0, False, False, 0)
+        else:
+            self._shm = _attach(name)
+            if bytes(self._shm.buf[:4]) != MAGIC:
+                self._shm.close()
+                raise ValueError('{} is no Elmo frame bus'.format(name))
+        magic, self.slots, self.slot_size = HEADER.unpack_from(self._shm.buf, 0)[:3]
+        self.skipped = 0 # zu große, nicht abgelegte Bilder
+
+    def _offset(self, seq):
+        return HEADER.size + (seq % self.slots)*(SLOT.size+self.slot_size)
+
+    def publish(self, seq, frame):
+        if len(frame) > self.slot_size:
+            self.skipped += 1
+            logging.warning('elmoBus: frame with {} bytes too large for slot'.format(len(frame)))
+            return
+        buf = self._shm.buf
+        offset = self._offset(seq)
+        SLOT.pack_into(buf, offset, 0, 0, 0.0) # Platz ungültig, solange geschrieben wird
+        start = offset+SLOT.size
+        buf[start:start+len(frame)] = frame
+        SLOT.pack_into(buf, offset, seq, len(frame), time.time())
+        struct.pack_into('<Q', buf, 12, seq)
+
+    def set_state(self, zooming, brightnessing, compression):
+        struct.pack_into('<??B', self._shm.buf, 20, zooming, brightnessing, compression)
+
+    def state(self):
+        ''' Zustand der Kamera (zooming, brightnessing, Kompression)'''
+        return struct.unpack_from('<??B', self._shm.buf, 20)
+
+    def latest_seq(self):
+        return struct.unpack_from('<Q', self._shm.buf, 12)[0]
+
+    def view(self, seq=None):
+        ''' Bild Nr. seq (Standard: neuestes) ohne Kopie als (seq, memoryview) oder (seq, None).
+        Der Inhalt ist gültig, solange valid(seq) True liefert (nach spätestens slots Bildern
+        wird der Platz überschrieben).'''
+        if seq is None:
+            seq = self.latest_seq()
+        offset = self._offset(seq)
+        slot_seq, length, timestamp = SLOT.unpack_from(self._shm.buf, offset)
+        if seq == 0 or slot_seq != seq:
+            return seq, None
+        return seq, self._shm.buf[offset+SLOT.size:offset+SLOT.size+length]
+
+    def valid(self, seq):
+        return SLOT.unpack_from(self._shm.buf, self._offset(seq))[0] == seq
+
+    def read(self, seq=None):
+        ''' Kopie des Bildes Nr. seq (Standard: neuestes) als (seq, bytes) oder (seq, None)'''
+        seq, view = self.view(seq)
+        if view is None:
+            return seq, None
+        data = bytes(view)
+        view.release()
+        return (seq, data) if self.valid(seq) else (seq, None)
+
+    def wait(self, after=0, timeout=None, poll=0.002):
+        ''' Wie FrameSlot.get(): Kopie des neuesten Bildes mit seq > after oder (after, None)'''
+        deadline = None if timeout is None else time.monotonic()+timeout
+        while True:
+            seq = self.latest_seq()
+            if seq > after:
+                seq, data = self.read(seq)
+                if data is not None:
+                    return seq, data
+            if deadline is not None and time.monotonic() > deadline:
+                return after, None
+            time.sleep(poll)
+
+    def close(self):
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+class BusCamera:
+    ''' Client-Sicht auf die Kamera des Dienstes name, verwendbar wie elmoCam.Elmo:
+    Befehle werden an den Dienst geschickt, der Zustand kommt aus dem Shared Memory.'''
+    test = False
+
+    def __init__(self, name='elmo'):
+        self.bus = FrameBus(name)
+        self._conn = Client(control_address(name), 'AF_UNIX', authkey=_read_key(name))
+        self._lock = threading.Lock()
+
+    @property
+    def zooming(self):
+        return self.bus.state()[0]
+
+    @property
+    def brightnessing(self):
+        return self.bus.state()[1]
+
+    def getCompression(self):
+        return self.bus.state()[2]
+
+    def _call(self, name, *args):
+        with self._lock:
+            self._conn.send((name, args))
+            ok, result = self._conn.recv()
+        if not ok:
+            raise RuntimeError('elmoBus: {} failed: {}'.format(name, result))
+        return result
+
+    def __getattr__(self, name):
+        if name not in COMMANDS:
+            raise AttributeError(name)
+        return lambda *args: self._call(name, *args)
+
+    def close(self):
+        self._conn.close()
+        self.bus.close()
+
+
+class BusCapture(threading.Thread):
+    ''' Ersatz für elmoCapture.CaptureThread in Clients: übernimmt neue Bilder aus dem
+    Shared Memory in slot und an Listener, führt Befehle über die BusCamera cam aus.
+    Die automatische Kompression (controller) regelt der Dienst, der Client schaltet sie nur.'''
+    def __init__(self, cam, slot=None):
+        threading.Thread.__init__(self, name='ElmoBusCapture', daemon=True)
+        self.cam = cam
+        self.slot = slot if slot is not None else elmoCapture.FrameSlot()
+        self.idle = False # ohne Bedeutung, die Kamera fragt der Dienst ab
+        self.failed = False # True falls der Dienst länger als timeout kein Bild liefert
+        self.timeout = 2.0
+        self.frames = 0
+        self.errors = 0
+        self._controller = None
+        self._listeners = []
+        self._stop_event = threading.Event()
+        self.commands = elmoCapture.CommandQueue(cam)
+
+    @property
+    def controller(self):
+        return self._controller
+
+    @controller.setter
+    def controller(self, controller):
+        ''' CompressionController ein-/ausschalten (None), geregelt wird im Dienst mit
+        dessen Übertragungszeiten, controller liefert hier nur still_compression'''
+        try:
+            self.cam.autoCompression(controller is not None)
+        except Exception as e:
+            logging.warning('elmoBus: auto compression not switched: {}'.format(e))
+            return
+        self._controller = controller
+
+    def add_listener(self, listener):
+        self._listeners = self._listeners + [listener]
+
+    def remove_listener(self, listener):
+        self._listeners = [l for l in self._listeners if l is not listener]
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def run(self):
+        seq = self.cam.bus.latest_seq()-1 # neuestes vorhandenes Bild sofort übernehmen
+        last = time.monotonic()
+        while not self._stop_event.is_set():
+            self.commands.run_pending()
+            seq, data = self.cam.bus.wait(seq, 0.05)
+            if data is None:
+                if time.monotonic()-last > self.timeout and not self.failed:
+                    self.failed = True
+                    self.errors += 1
+                continue
+            last = time.monotonic()
+            self.failed = False
+            self.frames += 1
+            self.slot.put(data)
+            for listener in self._listeners:
+                try:
+                    listener(self.slot.seq, data)
+                except Exception as e:
+                    logging.warning('elmoBus: listener exception: {}'.format(e))
+
+
+def _handle(conn, capture):
+    ''' Befehle eines Clients ausführen, bis er die Verbindung schließt'''
+    cam = capture.cam
+    try:
+        while True:
+            name, args = conn.recv()
+            try:
+                if name not in COMMANDS:
+                    raise ValueError('unknown command {}'.format(name))
+                if name in ('setCompression', 'getCompression'): # ohne USB-Zugriff
+                    result = getattr(cam, name)(*args)
+                elif name == 'autoCompression': # Regelung im Capture-Thread des Dienstes
+                    on = bool(args[0])
+                    if on != (capture.controller is not None):
+                        capture.controller = elmoCapture.CompressionController(cam) if on else None
+                    result = on
+                else:
+                    result = capture.commands.submit(name, *args).result(10)
+                conn.send((True, result))
+            except Exception as e:
+                conn.send((False, str(e)))
+    except (EOFError, OSError):
+        pass
+    finally:
+        conn.close()
+
+
+def serve(capture, name='elmo', slots=8, slot_size=4*1024*1024):
+    ''' Bilder des CaptureThread capture im Shared Memory name veröffentlichen und Befehle
+    von Clients annehmen, blockiert bis KeyboardInterrupt. Läuft bereits ein Dienst name,
+    wird RuntimeError ausgelöst, nur Reste eines beendeten Dienstes werden entfernt.'''
+    if running(name):
+        raise RuntimeError('elmoBus: service "{}" is already running'.format(name))
+    bus = FrameBus(name, create=True, slots=slots, slot_size=slot_size)
+    cam = capture.cam
+    def publish(seq, frame):
+        bus.publish(seq, frame)
+        bus.set_state(cam.zooming, cam.brightnessing, cam.getCompression())
+    capture.add_listener(publish)
+    address = control_address(name)
+    if os.path.exists(address):
+        os.unlink(address)
+    listener = Listener(address, 'AF_UNIX', authkey=_write_key(name)) # nur Clients mit Schlüssel
+    logging.warning('elmoBus: serving camera as "{}"...'.format(name))
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, EOFError, OSError) as e: # falscher Schlüssel oder Abbruch
+                logging.warning('elmoBus: client rejected: {}'.format(e))
+                continue
+            threading.Thread(target=_handle, args=(conn, capture), name='ElmoBusClient', daemon=True).start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.remove_listener(publish)
+        listener.close()
+        if os.path.exists(key_path(name)):
+            os.unlink(key_path(name))
+        bus.close()
+
+
+def watch(name):
+    ''' Nummer und Größe jedes neuen Bildes ausgeben (Beispiel für einen Client)'''
+    bus = FrameBus(name)
+    seq = bus.latest_seq()
+    try:
+        while True:
+            seq, view = bus.view(bus.wait(seq)[0])
+            if view is not None:
+                print('{} {} bytes'.format(seq, len(view)))
+                view.release()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bus.close()
+
+
+def main(argv=None):
+    import elmoCam
+    parser = argparse.ArgumentParser(description='Elmo L-12 für mehrere Programme bereitstellen')
+    parser.add_argument('--name', default='elmo', help='Name des gemeinsamen Speichers')
+    parser.add_argument('--watch', action='store_true', help='als Client Bildnummern ausgeben')
+    parser.add_argument('--slots', type=int, default=8, help='Anzahl Bilder im Ringpuffer')
+    parser.add_argument('--slot-size', type=int, default=4*1024*1024, help='max. Bildgröße in Bytes')
+    parser.add_argument('--compression', type=int, default=60, help='JPEG-Kompression 10-100')
+    elmoCam.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0)) # Speicher auch bei kill freigeben
+    if args.watch:
+        watch(args.name)
+        return
+    if running(args.name): # Speicher und Socket eines laufenden Dienstes nicht übernehmen
+        sys.exit('elmoBus-Dienst "{}" läuft bereits.'.format(args.name))
+    cam = elmoCam.open_from_args(args)
+    cam.setCompression(args.compression)
+    capture = elmoCapture.CaptureThread(cam)
+    capture.start()
+    try:
+        serve(capture, args.name, args.slots, args.slot_size)
+    finally:
+        capture.stop()
+        capture.join(1)
+
+
+if __name__ == '__main__':
+    main()
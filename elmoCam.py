@@ -11,15 +11,106 @@ S. Mack, 6.5.21
 
 import usb.core
 import usb.util
-from io import BytesIO # für Testbild
-from PIL import Image # für Testbild
 import logging
-#import time
+import sys
+import time
+import functools
+import threading
+from array import array
+
+PACKET_SIZE = 0xfef8 # max. Bilddaten-Bytes pro Portion (ohne 8 Byte Header)
+HEADER_READ = 512 # erster Lesevorgang pro Portion: 8 Byte Header + 504 Byte Bilddaten
+MAX_IMAGE_SIZE = 16*1024*1024 # Plausibilitätsgrenze für angekündigte Bildgröße
+ERRNO_NO_DEVICE = 19 # errno der USBError bei getrennter Kamera
+ERRNO_PIPE = 32 # Endpunkt blockiert (Stall)
+ERRNO_TIMEOUT = 110
+RESYNC_TIMEOUT = 100 # ms ohne Daten, nach denen resync() den Datenstrom als synchron ansieht
+DRAIN_TIMEOUT = 1000 # ms Wartezeit auf die Antwort eines offenen Bildes, das abgeholt oder verworfen wird
+
+
+def synchronized(method):
+    '''USB-Zugriffe aus verschiedenen Threads (Bildaufnahme, Bedienung) nacheinander ausführen'''
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _lap(acc, wall, cpu):
+    '''Wand- und CPU-Zeit seit (wall, cpu) in acc = [wall, cpu] aufaddieren, liefert neue Startzeiten'''
+    now_wall, now_cpu = time.perf_counter(), time.thread_time()
+    acc[0] += now_wall-wall
+    acc[1] += now_cpu-cpu
+    return now_wall, now_cpu
+
+
+def error_kind(e):
+    '''Art eines Fehlers beim USB-Zugriff: 'timeout', 'pipe', 'no_device' oder 'other'.
+    pyusb liefert die Fehlernummer in e.errno bzw. e.args[0] (nicht e[0] wie unter Python 2).'''
+    if not isinstance(e, usb.core.USBError):
+        return 'other'
+    errno = e.errno if e.errno is not None else (e.args[0] if e.args else None)
+    return {ERRNO_TIMEOUT: 'timeout', ERRNO_PIPE: 'pipe', ERRNO_NO_DEVICE: 'no_device'}.get(errno, 'other')
+
+
+def find_all(vendor=0x09a1, product=0x001d):
+    '''Alle angeschlossenen Elmo L-12 Kameras als Liste von pyusb-Geräten'''
+    return list(usb.core.find(find_all=True, idVendor=vendor, idProduct=product))
+
+
+def device_serial(device):
+    '''Seriennummer eines pyusb-Geräts oder None (fehlende Rechte oder keine Seriennummer)'''
+    try:
+        return usb.util.get_string(device, device.iSerialNumber)
+    except (usb.core.USBError, ValueError):
+        return None
+
+
+def device_port(device):
+    '''Anschluss eines pyusb-Geräts als "Bus-Port.Port...", z.B. "1-2.3"'''
+    return '{}-{}'.format(device.bus, '.'.join(str(p) for p in (device.port_numbers or ())))
+
+
+def add_arguments(parser, port='--port', sim_default=False):
+    '''Optionen der Kommandozeilenwerkzeuge zur Auswahl der Kamera (s. connect_args()).
+    port: Name der Option für den USB-Anschluss, falls --port anderweitig belegt ist.
+    sim_default: ohne Option simulierte Kamera, --hardware wählt die angeschlossene Elmo.'''
+    parser.add_argument(port, dest='usb_port', default=None, help='Kamera am USB-Anschluss, z.B. 1-2.3')
+    parser.add_argument('--serial', default=None, help='Kamera mit Seriennummer')
+    if sim_default:
+        parser.add_argument('--hardware', dest='sim', action='store_false', help='angeschlossene Elmo L-12 statt Simulation verwenden')
+    else:
+        parser.add_argument('--sim', action='store_true', help='simulierte Kamera (elmoSim) statt USB')
+    parser.add_argument('--replay', default=None, help='Aufzeichnung (elmoTrace) statt USB abspielen')
+
+
+def connect_args(args, sim=None, replay=None):
+    '''Parameter für Elmo.connect() aus den Optionen von add_arguments(): Wiedergabe,
+    Simulation oder Auswahl über Anschluss/Seriennummer. sim bzw. replay: weitere Parameter
+    für elmoSim.SimulatedElmo bzw. elmoTrace.ReplayDevice.'''
+    if args.replay:
+        import elmoTrace
+        return dict(device=elmoTrace.ReplayDevice(args.replay, **(replay or {})))
+    if args.sim:
+        import elmoSim
+        return dict(device=elmoSim.SimulatedElmo(**(sim or {})))
+    return dict(port=args.usb_port, serial=args.serial)
+
+
+def open_from_args(args, sim=None, replay=None):
+    '''Mit den Optionen von add_arguments() verbundene Elmo, beendet das Programm falls
+    keine Kamera gefunden wird'''
+    cam = Elmo()
+    if cam.connect(**connect_args(args, sim, replay)) == -1:
+        sys.exit('Keine Elmo L-12 Kamera gefunden.')
+    return cam
 
 
 class Elmo:
     def __init__(self):
         self.device = None
+        self.lock = threading.RLock() # ein USB-Zugriff zur Zeit
         self.msg = {
             'version':          [0, 0, 0, 0, 0x18, 0, 0, 0, 0x10, 0x8B, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
             'picture':          [0, 0, 0, 0, 0x18, 0, 0, 0, 0x8e, 0x80, 0, 0, 60, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
@@ -37,13 +128,45 @@ class Elmo:
         self.brightnessing = False
         self.focusing = False
         self.compression = 60
+        self.disconnected = False # True: Kamera getrennt, reconnect() nötig
+        self._selection = {} # Parameter von connect() für reconnect()
+        self.tracer = None # elmoTrace.TraceRecorder, falls USB-Verkehr aufgezeichnet wird
+        self.timing = {} # Zeiten [Wand, CPU] in s je Abschnitt des letzten get_image() (request, read, reassembly)
+        self.frame_bytes = 0 # Größe des letzten Bildes in Bytes
+        self._head_buf = array('B', bytes(HEADER_READ)) # wiederverwendete Lesepuffer für get_image()
+        self._body_buf = array('B', bytes(PACKET_SIZE-(HEADER_READ-8)))
+        # Pipeline-Betrieb: jede Portion mit einem Lesevorgang (Header + 0xfef8 Bytes) und
+        # Anforderung des nächsten Bildes direkt nach dem letzten Lesevorgang (prefetch)
+        self.pipelined = False
+        self.prefetch_max_age = 0.5 # s, ältere vorausangeforderte Bilder werden verworfen
+        self._packet_buf = None
+        self._prefetched = None # (Kompression, Zeitpunkt) des vorausangeforderten Bildes
+        self._reply = None # von resync() bereits gelesene Antwort auf eine Bildanforderung
+        self._frame = None # (Kompression, Zeitpunkt, Bilddaten) des vor einem Steuerbefehl abgeholten Bildes
         #### ACHTUNG hier False wenn Elmo-Kamera in Betrieb sons zu Testzwecken True ####
         self.test = False # Livebild via USB
         #self.test = True # Betrieb ohne Elmo und Testbild statt Livebild
 
-    def connect(self, vendor=0x09a1, product=0x001d):
+    @synchronized
+    def connect(self, vendor=0x09a1, product=0x001d, device=None, bus=None, address=None, port=None, serial=None):
+        '''Verbindung herstellen. Bei mehreren Kameras Auswahl über bus/address, port (z.B. "1-2.3")
+        oder serial, ohne Auswahl wird die erste gefundene Kamera verwendet.'''
         if self.test: return
-        self.device = usb.core.find(idVendor=vendor,  idProduct=product)
+        if isinstance(device, usb.core.Device): # bei Neuverbindung über Anschluss wiederfinden
+            self._selection = dict(vendor=vendor, product=product, port=device_port(device))
+        else:
+            self._selection = dict(vendor=vendor, product=product, device=device, bus=bus, address=address, port=port, serial=serial)
+        if device is not None: # bereits gefundenes oder simuliertes Gerät (elmoSim) verwenden
+            self.device = device
+        elif bus is None and address is None and port is None and serial is None:
+            self.device = usb.core.find(idVendor=vendor,  idProduct=product)
+        else:
+            self.device = None
+            for dev in find_all(vendor, product):
+                if ((bus is None or dev.bus == bus) and (address is None or dev.address == address)
+                        and (port is None or device_port(dev) == port) and (serial is None or device_serial(dev) == serial)):
+                    self.device = dev
+                    break
 
         if self.device is None:
             return -1
@@ -54,9 +177,52 @@ class Elmo:
                 usb.util.claim_interface(self.device,  0)
         self.device.reset()
         self.device.set_configuration()
+        self._prefetched = None
+        self._reply = None
+        self._frame = None
+        if self.tracer is not None: # Aufzeichnung mit neuem Gerät fortsetzen
+            self.tracer.device = self.device
+            self.device = self.tracer
+        self.zooming = False
+        self.brightnessing = False
+        self.disconnected = False
 
         return self
 
+    @synchronized
+    def reconnect(self):
+        '''Erneut verbinden (z.B. nachdem die Kamera wieder eingesteckt wurde), Auswahl der
+        Kamera wie beim letzten connect(). Liefert -1 falls die Kamera (noch) nicht verfügbar ist.'''
+        if self.test: return
+        logging.debug('elmoCam: reconnect()...')
+        device = self.tracer.device if self.tracer is not None else self.device
+        if isinstance(device, usb.core.Device):
+            usb.util.dispose_resources(device)
+        self.disconnected = True
+        try:
+            result = self.connect(**self._selection)
+        except usb.core.USBError as e:
+            logging.warning('elmoCam: reconnect() {} error: {}'.format(error_kind(e), e))
+            return -1
+        if result == -1:
+            self.device = None
+        return result
+
+    @synchronized
+    def start_trace(self, path):
+        '''Alle USB-Transfers in die Datei path aufzeichnen (Wiedergabe mit elmoTrace.ReplayDevice)'''
+        import elmoTrace
+        self.stop_trace()
+        self.tracer = elmoTrace.TraceRecorder(self.device, path)
+        self.device = self.tracer
+
+    @synchronized
+    def stop_trace(self):
+        if self.tracer is not None:
+            self.device = self.tracer.device
+            self.tracer.close()
+            self.tracer = None
+
     def setCompression(self, compression, absolute=True):
         logging.debug('elmoCam: setCompression() +/-Val: {}'.format(compression))
         if absolute:
@@ -69,8 +235,10 @@ class Elmo:
     def getCompression(self):
         return self.compression
 
+    @synchronized
     def zoom(self, i): # Button Press wechselt zwischen -1/+1 und 0
         if self.test: return
+        self._collect()
         if self.zooming:
             self.device.write(0x02, self.msg['zoom_stop'], 0)
             self.device.read(0x81, 32)
@@ -84,8 +252,10 @@ class Elmo:
         self.zooming = True
         self.device.read(0x81, 32)
 
+    @synchronized
     def brightness(self, i):
         if self.test: return
+        self._collect()
         if self.brightnessing:
             self.device.write(0x02, self.msg['brightness_stop'], 0)
             self.device.read(0x81, 32)
@@ -102,75 +272,303 @@ class Elmo:
         self.brightnessing = True
         self.device.read(0x81, 32)
 
+    @synchronized
     def autobrightness(self):
         if self.test: return
+        self._collect()
         self.device.write(0x02, self.msg['brightness_auto'], 0)
         self.device.read(0x81, 32)
 
+    @synchronized
     def autofocus(self):
         if self.test: return
+        self._collect()
         self.device.write(0x02, self.msg['focus_auto'], 0)
         self.device.read(0x81, 32)
 
+    @synchronized
     def version(self):
         if self.test: return
+        self._collect()
         self.device.write(0x02, self.msg['version'], 0)
         ret = self.device.read(0x81, 32)
         return ret
 
+    def _collect(self):
+        '''Pipeline-Betrieb: offenes (vorausangefordertes) Bild vor einem Steuerbefehl vollständig
+        abholen, damit die Kamera Befehle nie während einer Bildübertragung erhält. Das Bild
+        liefert das nächste get_image().'''
+        pending = self._pending()
+        if pending is None or self.device is None or self.disconnected:
+            return
+        img = self._read_image({'request': [0.0, 0.0], 'read': [0.0, 0.0], 'reassembly': [0.0, 0.0]}, DRAIN_TIMEOUT)
+        if img:
+            self._frame = pending+(img,)
+
+    def _pending(self):
+        '''(Kompression, Zeitpunkt) des offenen Bildes oder None. Eine von resync() gefundene
+        Antwort gehört zu einem Bild unbekannter Kompression.'''
+        pending, self._prefetched = self._prefetched, None
+        if pending is None and self._reply is not None:
+            pending = (None, time.monotonic())
+        return pending
+
+    def _usable(self, compression, requested):
+        '''Offenes oder abgeholtes Bild passt zur aktuellen Kompression und ist nicht zu alt'''
+        return compression == self.compression and time.monotonic()-requested <= self.prefetch_max_age
+
+    @synchronized
     def clear_device(self): # alle Bytes auslesen bis Timeout
+        '''Clear the devices memory on endpoint 0x83'''
         logging.debug('elmoCam: clear_device()...')
         if self.test: return
-        '''Clear the devices memory on endpoint 0x83'''
-        while True:
+        for i in range(MAX_IMAGE_SIZE//HEADER_READ): # begrenzt, falls das Gerät ständig sendet
             try:
-                self.device.read(0x83, 512, 10) # wieso 512 und (ursprünglich) Default Timeout?
-            except usb.core.USBError as e: # USBError gibt Error Number und String (Fehlerbeschreibung) zurück
-                logging.warning('elmoCam: clear_device() USBError No. {}: {}'.format(e[0],e[1]))
-                if (e.args[0] == 110): # 110 ist pyusb Timeout exception
-                    logging.debug('elmoCam: clear_device() > timeout...')
-                    break
+                self.device.read(0x83, self._head_buf, 10)
+            except usb.core.USBError as e: # Fehlernummer in e.args[0], Beschreibung in e.strerror
+                kind = error_kind(e)
+                logging.debug('elmoCam: clear_device() > {}: {}'.format(kind, e))
+                if kind == 'pipe':
+                    self.device.clear_halt(0x83)
+                    continue
+                if kind == 'no_device':
+                    self.disconnected = True
+                break
+
+    @synchronized
+    def resync(self, timeout=RESYNC_TIMEOUT, head=None):
+        '''Nach einem Fehler die Restdaten des unterbrochenen Bildes verwerfen. Jede Portion wird
+        anhand ihres Headers (02 00 00 00 DDDD) vollständig übersprungen, bis die Antwort (0x20)
+        auf eine Bildanforderung folgt oder timeout ms lang keine Daten kommen. head: bereits
+        gelesene Daten, z.B. ein Header statt der erwarteten Antwort. Eine gefundene Antwort wird
+        für das nächste Bild aufgehoben (_reply). Liefert True wenn der Datenstrom wieder synchron ist.'''
+        logging.debug('elmoCam: resync()...')
+        if self.test: return True
+        buf = self._packet_buffer()
+        for i in range(2*(MAX_IMAGE_SIZE//PACKET_SIZE+2)):
+            try:
+                if head is None:
+                    n = self.device.read(0x83, buf, timeout)
+                    head = buf[:n]
+                if len(head) == 32 and head[0] == 0x20 and head[4] == 0x18: # Antwort > nächstes Bild beginnt
+                    logging.debug('elmoCam: resync() > reply for {} bytes'.format(int.from_bytes(bytes(head[8:12]), 'little')))
+                    self._reply = array('B', head)
+                    return True
+                if len(head) >= 8 and head[0] == 0x02 and head[1] == 0 and head[2] == 0 and head[3] == 0:
+                    rest = 256*head[5]+head[4]-(len(head)-8)
+                    head = None
+                    while rest > 0: # Rest der Portion überspringen
+                        rest -= self.device.read(0x83, buf, timeout)
+                head = None # sonst Bruchstück einer Portion > verwerfen
+            except usb.core.USBError as e:
+                kind = error_kind(e)
+                logging.debug('elmoCam: resync() > {}: {}'.format(kind, e))
+                if kind == 'timeout': # keine Daten mehr
+                    return True
+                if kind == 'pipe':
+                    self.device.clear_halt(0x83)
+                    head = None
+                    continue
+                if kind == 'no_device':
+                    self.disconnected = True
+                return False
+        return False
+
+    def _packet_buffer(self):
+        '''Wiederverwendeter Lesepuffer für eine ganze Portion (Header + 0xfef8 Bytes)'''
+        if self._packet_buf is None:
+            self._packet_buf = array('B', bytes(8+PACKET_SIZE))
+        return self._packet_buf
+
+    def _request(self):
+        '''Bild mit aktueller Kompression anfordern, liefert False bei getrennter Kamera'''
+        try:
+            a = self.msg['picture']
+            a[12] = self.compression # jpeg compression ratio
+            self.device.write(0x04,  self.msg['picture']) # Anforderung Bild, ursprünglich Timeout 0
+        except usb.core.USBError as e:
+            logging.warning('elmoCam: get_image() > device.write() {} error: {}'.format(error_kind(e), e)) # exception unabhängig vom Timeout
+            if error_kind(e) == 'no_device':
+                self.disconnected = True
+                return False
+        return True
+
+    def _recover(self, e, head=None):
+        '''Fehler während get_image(): bei getrennter Kamera disconnected setzen, sonst
+        Restdaten per resync() verwerfen (clear_device() nur falls das scheitert). head: bereits
+        gelesene, unerwartete Daten für resync(). Liefert False.'''
+        kind = error_kind(e)
+        logging.warning('elmoCam: get_image() > {} error: {}'.format(kind, e))
+        if kind == 'no_device':
+            self.disconnected = True
+        elif not self.resync(head=head) and not self.disconnected:
+            self.clear_device()
+        return False
+
+    @synchronized
+    def snapshot(self, compression=80, retries=3):
+        '''Einzelbild mit mind. der jpg-Qualität compression über die bestehende Verbindung aufnehmen.
+        Liefert die unveränderten JPEG-Bytes oder False.'''
+        previous = self.compression
+        self.setCompression(max(previous, compression))
+        try:
+            for i in range(retries):
+                data = self.get_image()
+                if data:
+                    return data
+            logging.warning('elmoCam: snapshot() failed...')
+            return False
+        finally:
+            self.compression = previous # ursprüngliche jpg-Qualität einstellen
 
     def get_test_image(self):
+        from io import BytesIO # PIL nur im Testbetrieb laden (schnellerer Start)
+        from PIL import Image
         im = Image.open('testbild.jpg')
         buf = BytesIO()
         im.save(buf, format='JPEG')
         byte_im = buf.getvalue()
         return(byte_im)
     
+    @synchronized
     def get_image(self):
         logging.debug('elmoCam: get_image()...')
         if self.test: 
-            im = Image.open('testbild.jpg')
-            buf = BytesIO()
-            im.save(buf, format='JPEG')
-            byte_im = buf.getvalue()
-            return(byte_im)    
-        try:
-            a = self.msg['picture']
-            a[12] = self.compression # jpeg compression ratio
-            self.device.write(0x04,  self.msg['picture']) # Anforderung Bild, ursprünglich Timeout 0
-        except:
-            logging.warning('elmoCam: get_image() > device.write() exeption...') # exception unabhängig vom Timeout
-        try:
-            ret = self.device.read(0x83, 32, 100) # Antwort auf Anforderung Bild mit # Bilddaten-Bytes in Byte 4 und 5, urspränglich kein Timeout
-            logging.debug('elmoCam: get_image() poll total {} Bytes to read.'.format(256*ret[5]+ret[4]))
-        except:
-            logging.warning('elmoCam: get_image() poll > device.read() exception...') # exception sporadisch bei Timeout <100
-            self.clear_device()
+            return self.get_test_image()
+        if self.device is None or self.disconnected:
+            self.disconnected = True
             return False
-        whole_img_bytes = [] # Liste für Bytes des gesammten Bildes
+        timing = {'request': [0.0, 0.0], 'read': [0.0, 0.0], 'reassembly': [0.0, 0.0]}
+        wall, cpu = time.perf_counter(), time.thread_time()
+        frame, self._frame = self._frame, None
+        if frame is not None and self._usable(*frame[:2]): # vor einem Steuerbefehl abgeholt
+            img = frame[2]
+        else:
+            pending = self._pending()
+            for i in range(3): # andere Kompression oder zu alt > offenes Bild vollständig lesen und
+                # verwerfen, sonst gilt es als Antwort auf die nächste Anforderung
+                if pending is None or self._usable(*pending):
+                    break
+                logging.debug('elmoCam: get_image() > discard prefetched image')
+                self._read_image(timing, DRAIN_TIMEOUT)
+                if self.disconnected:
+                    return False
+                pending = self._pending()
+            else: # Datenstrom nicht überschaubar > alles verwerfen
+                self._reply = None
+                self.clear_device()
+                pending = None
+            if pending is None:
+                pending = (self.compression, time.monotonic())
+                if not self._request():
+                    return False
+            wall, cpu = _lap(timing['request'], wall, cpu)
+            img = self._read_image(timing, 100, pending)
+            if not img:
+                return False
+            wall, cpu = time.perf_counter(), time.thread_time()
+        if self.pipelined: # nächstes Bild anfordern, während dieses weiterverarbeitet wird
+            if self._request():
+                self._prefetched = (self.compression, time.monotonic())
+            _lap(timing['request'], wall, cpu)
+        self.timing = timing
+        self.frame_bytes = len(img)
+        return img # Bilddaten als Byte Array
+
+    def _read_image(self, timing, timeout, pending=None):
+        '''Antwort und Portionen des offenen Bildes lesen, liefert die Bilddaten oder False.
+        timeout: Wartezeit in ms auf die Antwort. pending: (Kompression, Zeitpunkt) der
+        Anforderung, die bei Timeout der Antwort offen bleibt (max. prefetch_max_age alt).'''
+        wall, cpu = time.perf_counter(), time.thread_time()
+        for attempt in range(2): # zweiter Versuch mit der von resync() gefundenen Antwort
+            ret = None
+            try:
+                if self._reply is not None:
+                    ret, self._reply = self._reply, None
+                else:
+                    ret = self.device.read(0x83, 32, timeout) # Antwort auf Anforderung Bild mit Bildgröße XXXX ab Byte 8, urspränglich kein Timeout
+                    if len(ret) == 8 and ret[0] == 0x02 and ret[4] == 0 and ret[5] == 0: # leere Abschlussportion des vorigen Bildes
+                        ret = self.device.read(0x83, 32, timeout)
+                if len(ret) < 12 or ret[0] != 0x20: # Restdaten eines früheren Bildes statt Antwort
+                    raise ValueError('unexpected reply {}'.format(bytes(ret[:8]).hex()))
+                logging.debug('elmoCam: get_image() poll total {} Bytes to read.'.format(int.from_bytes(bytes(ret[8:12]), 'little')))
+                break
+            except Exception as e: # exception sporadisch bei Timeout <100
+                if pending is not None and error_kind(e) == 'timeout' and time.monotonic()-pending[1] <= self.prefetch_max_age:
+                    # Kamera braucht länger als 100ms: Bild kommt noch, beim nächsten Aufruf ohne
+                    # neue Anforderung abholen (wie vorausangefordertes Bild, max. prefetch_max_age alt)
+                    logging.debug('elmoCam: get_image() > image not ready, keep request')
+                    self._prefetched = pending
+                    return False
+                # Restdaten bis zur Antwort auf diese Anforderung überspringen, max. ein Bild verloren
+                self._recover(e, ret if isinstance(e, ValueError) else None)
+                if attempt or self._reply is None:
+                    return False
+                logging.debug('elmoCam: get_image() > continue with reply found by resync()')
+        wall, cpu = _lap(timing['request'], wall, cpu)
+        total = int.from_bytes(bytes(ret[8:12]), 'little') # angekündigte Bildgröße XXXX ohne Header (s. infoElmoProtokoll.md)
+        if not 0 < total <= MAX_IMAGE_SIZE: # unplausibel > Datenstrom nicht synchron
+            return self._recover(ValueError('implausible image size {}'.format(total)))
+        img = bytearray(total) # ein Puffer pro Bild, keine Liste aus Integern mehr
+        view = memoryview(img)
+        pos = 0 # Anzahl bereits eingelesener Bilddaten-Bytes
         # 0xfef8 (65272) is the maximum size of a package. if it is smaller => the last package and exit
-        size = 0xfef8 # Portionen von 0xfef8 (65272) Bytes (ab 8. Byte) mit Bilddaten
-        while size == 0xfef8: # falls Portion kleiner, dann Rest = letzte Portion
+        size = PACKET_SIZE # Portionen von 0xfef8 (65272) Bytes (ab 8. Byte) mit Bilddaten
+        if self.pipelined:
+            packet = memoryview(self._packet_buffer())
+        while size == PACKET_SIZE and pos < total and self.pipelined: # ein Lesevorgang je Portion, Transfer endet mit der Portion
             try:
-                ret = self.device.read(0x83, 512) # Bilddaten ab dem 8. Byte hier enthalten
-                size = 256*ret[5]+ret[4] # Byte-Anzahl Bilddaten in Byte 4 und 5 codiert
+                n = self.device.read(0x83, self._packet_buf)
+                wall, cpu = _lap(timing['read'], wall, cpu)
+                head = self._packet_buf
+                if n < 8 or head[0] != 0x02: # kein Header 0200 0000 > Datenstrom nicht synchron
+                    view.release()
+                    return self._recover(ValueError('invalid packet header {}'.format(bytes(head[:8]).hex())), head[:n])
+                size = 256*head[5]+head[4]
+                if n-8 < size:
+                    raise ValueError('short packet: {} of {} bytes'.format(n-8, size))
+                if pos+size > total:
+                    raise ValueError('more data than announced: {} of {} bytes'.format(pos+size, total))
+                view[pos:pos+size] = packet[8:8+size]
+                pos += size
+                wall, cpu = _lap(timing['reassembly'], wall, cpu)
+            except Exception as e:
+                logging.debug('elmoCam: get_image() > exception reading image. Last data size: {}'.format(size))
+                view.release()
+                return self._recover(e)
+        while size == PACKET_SIZE and pos < total: # falls Portion kleiner, dann Rest = letzte Portion; bei Bildgröße
+            # als Vielfaches von 0xfef8 endet das Bild mit der letzten vollen Portion (ggf. folgt eine leere)
+            try:
+                n = self.device.read(0x83, self._head_buf) # Header + erste 504 Bytes Bilddaten direkt in Puffer
+                wall, cpu = _lap(timing['read'], wall, cpu)
+                head = self._head_buf
+                if head[0] != 0x02: # kein Header 0200 0000 > Datenstrom nicht synchron
+                    view.release()
+                    return self._recover(ValueError('invalid packet header {}'.format(bytes(head[:8]).hex())), head[:n])
+                size = 256*head[5]+head[4] # Byte-Anzahl Bilddaten in Byte 4 und 5 codiert
                 logging.debug('size: {} (should be 65272)'.format(size))
-                img_data = self.device.read(0x83, (size-504)) # restliche der 65272 Bytes lesen
-                whole_img_bytes += ret[8:]+ img_data # gelesene Bytes an Liste anfügen 
-            except: # es konnten keine 65272 Bytes gelesen werden > vermulich letzte Portion Bilddaten
-                logging.warning('elmoCam: get_image() > exception reading image. Last data size: {}'.format(size))
-                self.clear_device() # falls noch Daten am USB Port anliegen, diese auslesen und wegwerfen.
-                return False
-        return bytearray(whole_img_bytes) # Bilddaten (8-Bit Integer List) in Byte Array umwandeln       
+                n = min(size, HEADER_READ-8) # Bilddaten bereits im Header-Block enthalten
+                if pos+size > total: # mehr Daten als angekündigt > Datenstrom nicht synchron
+                    raise ValueError('more data than announced: {} of {} bytes'.format(pos+size, total))
+                view[pos:pos+n] = memoryview(head)[8:8+n]
+                pos += n
+                wall, cpu = _lap(timing['reassembly'], wall, cpu)
+                if size > n:
+                    if size == PACKET_SIZE: # volle Portion > wiederverwendeten Puffer fester Größe füllen
+                        self.device.read(0x83, self._body_buf)
+                        body = self._body_buf
+                    else: # letzte (kleinere) Portion
+                        body = self.device.read(0x83, (size-n)) # restliche Bytes lesen
+                    wall, cpu = _lap(timing['read'], wall, cpu)
+                    view[pos:pos+size-n] = memoryview(body)[:size-n]
+                    pos += size-n
+                    wall, cpu = _lap(timing['reassembly'], wall, cpu)
+            except Exception as e: # Portion nicht lesbar > Rest des Bildes verwerfen, max. ein Bild verloren
+                logging.debug('elmoCam: get_image() > exception reading image. Last data size: {}'.format(size))
+                view.release()
+                return self._recover(e)
+        view.release()
+        if pos != total: # Portion verloren > unvollständiges Bild verwerfen statt abgeschnitten liefern
+            return self._recover(ValueError('incomplete image: {} of {} bytes'.format(pos, total)))
+        _lap(timing['reassembly'], wall, cpu)
+        return img
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Bildaufnahme der Elmo L-12 in einem eigenen Thread.
+Der Thread fragt die Kamera fortlaufend ab und legt nur das jeweils neueste
+vollständige JPEG-Bild in einem Puffer mit genau einem Platz ab (ältere Bilder
+werden überschrieben). Die Benutzeroberfläche holt sich beim Zeichnen das
+neueste Bild ab, USB-Übertragung und Darstellung laufen so überlappend.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class FrameSlot:
+    ''' Puffer für genau ein Bild, ein neues Bild überschreibt das vorherige.
+    Jedes Bild erhält eine fortlaufende Nummer (seq), damit Leser erkennen, ob es neu ist.'''
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self.seq = 0
+        self.timestamp = None
+
+    def put(self, frame):
+        with self._cond:
+            self._frame = frame
+            self.seq += 1
+            self.timestamp = time.monotonic()
+            self._cond.notify_all()
+
+    def get(self, after=0, timeout=None):
+        ''' Liefert (seq, frame) sobald ein Bild mit seq > after vorliegt.
+        Nach Ablauf von timeout (Sekunden) ohne neues Bild wird (after, None) zurückgegeben.'''
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > after, timeout):
+                return after, None
+            return self.seq, self._frame
+
+    def latest(self):
+        with self._cond:
+            return self.seq, self._frame
+
+
+class FrameRing:
+    ''' Ringpuffer der letzten JPEG-Bilder (komprimiert, mit Zeitstempel), begrenzt durch
+    die Anzahl max_frames und die Gesamtgröße max_bytes. add() kann direkt als Listener
+    eines CaptureThread verwendet werden.'''
+    def __init__(self, max_frames=300, max_bytes=64*1024*1024):
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._frames = deque()
+        self._lock = threading.Lock()
+
+    def add(self, seq, frame):
+        with self._lock:
+            self._frames.append((time.time(), frame))
+            self.bytes += len(frame)
+            while len(self._frames) > self.max_frames or (self.bytes > self.max_bytes and len(self._frames) > 1):
+                self.bytes -= len(self._frames.popleft()[1])
+
+    def __len__(self):
+        return len(self._frames)
+
+    def frames(self):
+        ''' Momentaufnahme des Puffers als Liste aus (Zeitstempel, JPEG-Bytes), älteste zuerst'''
+        with self._lock:
+            return list(self._frames)
+
+
+class CommandQueue:
+    ''' Warteschlange für Kamerabefehle (Methodennamen von elmoCam.Elmo, z.B. zoom, brightness,
+    autofocus, version), die der Capture-Thread zwischen zwei Bildern ausführt.
+    submit() kehrt sofort zurück und liefert ein Future mit dem Rückgabewert der Methode.
+    Ein noch nicht ausgeführtes Start/Stop-Paar von zoom bzw. brightness hebt sich auf.'''
+    def __init__(self, cam, wakeup=None):
+        self.cam = cam
+        self.wakeup = wakeup # Event, das den Capture-Thread aus Wartezeiten weckt
+        self._lock = threading.Lock()
+        self._pending = [] # Liste aus [name, args, future, role]
+        self._executing = False
+        self._state = {} # erwarteter Zustand (zooming/brightnessing) nach allen ausstehenden Befehlen
+
+    def submit(self, name, *args):
+        future = Future()
+        with self._lock:
+            if not self._pending and not self._executing: # Zustand der Kamera übernehmen
+                self._state = {'zoom': self.cam.zooming, 'brightness': self.cam.brightnessing}
+            role = None # start, stop oder None für Befehle ohne Zustand
+            if name == 'zoom':
+                role = 'stop' if self._state['zoom'] else 'start'
+            elif name == 'brightness':
+                if self._state['brightness']:
+                    role = 'stop'
+                elif args and args[0] != 0:
+                    role = 'start'
+            if role == 'stop':
+                for i in reversed(range(len(self._pending))):
+                    if self._pending[i][0] == name:
+                        if self._pending[i][3] == 'start': # Start noch nicht ausgeführt > beide entfallen
+                            logging.debug('elmoCapture: collapse {} start/stop'.format(name))
+                            self._pending.pop(i)[2].set_result(None)
+                            self._state[name] = False
+                            future.set_result(None)
+                            return future
+                        break
+            if role is not None:
+                self._state[name] = role == 'start'
+            self._pending.append([name, args, future, role])
+        if self.wakeup is not None:
+            self.wakeup.set()
+        return future
+
+    def run_pending(self):
+        ''' Alle ausstehenden Befehle ausführen (im Capture-Thread zwischen zwei Bildern)'''
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            self._executing = True
+        try:
+            for name, args, future, role in pending:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                logging.debug('elmoCapture: command {}{}'.format(name, args))
+                try:
+                    future.set_result(getattr(self.cam, name)(*args))
+                except Exception as e:
+                    logging.warning('elmoCapture: command {} exception: {}'.format(name, e))
+                    future.set_exception(e)
+        finally:
+            with self._lock:
+                self._executing = False
+
+
+class CompressionController:
+    ''' Regelt die JPEG-Kompression (10-100) automatisch, so dass eine Ziel-Bildrate
+    target_fps und optional ein USB-Durchsatz max_throughput (Bytes/s) eingehalten werden.
+    Gemessen werden Bildgröße und Übertragungszeit von get_image(). Nach jeder Änderung
+    wird settle Bilder lang gewartet, die Hysterese verhindert ständiges Umschalten.'''
+    def __init__(self, cam, target_fps=15, max_throughput=None, step=5, hysteresis=0.15, smoothing=0.3, settle=5):
+        self.cam = cam
+        self.target_fps = target_fps
+        self.max_throughput = max_throughput
+        self.step = step
+        self.hysteresis = hysteresis
+        self.smoothing = smoothing # Gewicht des neuesten Messwerts im gleitenden Mittel
+        self.settle = settle
+        self.still_compression = 100 # maximale Qualität für Einzelbilder
+        self.fps = None # erreichbare Bildrate aus Übertragungszeit (gleitendes Mittel)
+        self.throughput = None # genutzter Durchsatz in Bytes/s (gleitendes Mittel)
+        self._last = None
+        self._hold = 0
+
+    def _average(self, old, new):
+        return new if old is None else old + self.smoothing*(new-old)
+
+    def update(self, frame_bytes, transfer_time, now=None):
+        ''' Nach jedem Bild aufrufen, passt ggf. die Kompression der Kamera an'''
+        now = time.monotonic() if now is None else now
+        if transfer_time > 0:
+            self.fps = self._average(self.fps, 1/transfer_time)
+        if self._last is not None and now > self._last:
+            self.throughput = self._average(self.throughput, frame_bytes/(now-self._last))
+        self._last = now
+        if self._hold > 0 or self.fps is None:
+            self._hold -= 1
+            return
+        low = self.fps < self.target_fps*(1-self.hysteresis)
+        high = self.fps > self.target_fps*(1+self.hysteresis)
+        if self.max_throughput and self.throughput is not None:
+            low = low or self.throughput > self.max_throughput*(1+self.hysteresis)
+            high = high and self.throughput < self.max_throughput*(1-self.hysteresis)
+        compression = self.cam.getCompression()
+        if low and compression > 10:
+            self.cam.setCompression(-self.step, False)
+        elif high and compression < 100:
+            self.cam.setCompression(self.step, False)
+        else:
+            return
+        logging.debug('elmoCapture: auto compression {} > {} ({:.1f} fps)'.format(compression, self.cam.getCompression(), self.fps))
+        self._hold = self.settle
+        self.fps = None # Messung mit neuer Kompression neu beginnen
+
+
+class CaptureThread(threading.Thread):
+    ''' Holt fortlaufend Bilder von einer Elmo-Instanz und legt sie in slot ab.
+    interval ist der minimale Abstand zwischen zwei Bildanforderungen in Sekunden.
+    Ist die Kamera getrennt oder schlagen max_failures Bilder in Folge fehl, wird sie neu
+    verbunden, die Wartezeit zwischen zwei Versuchen verdoppelt sich von reconnect_delay[0]
+    bis reconnect_delay[1] Sekunden (wieder eingesteckte Kamera wird so automatisch übernommen).'''
+    def __init__(self, cam, slot=None, interval=0):
+        threading.Thread.__init__(self, name='ElmoCapture', daemon=True)
+        self.cam = cam
+        self.slot = slot if slot is not None else FrameSlot()
+        self.interval = interval
+        self.idle = False # True: Bild unverändert, Kamera seltener abfragen
+        self.idle_interval = 0.25
+        self.failed = False # True falls letzte Bildanforderung fehlgeschlagen
+        self.frames = 0
+        self.errors = 0
+        self.max_failures = 5
+        self.reconnect_delay = (0.5, 5.0)
+        self.reconnects = 0 # Anzahl erfolgreicher Neuverbindungen
+        self._failures = 0 # aufeinanderfolgende Fehler
+        self._listeners = [] # Funktionen f(seq, frame), die jedes neue Bild erhalten
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event() # beendet Wartezeiten bei neuen Befehlen oder stop()
+        self.commands = CommandQueue(cam, self._wakeup)
+        self.controller = None # CompressionController für automatische Kompression
+
+    def add_listener(self, listener):
+        ''' listener(seq, frame) wird im Capture-Thread für jedes neue Bild aufgerufen.
+        Blockiert listener, wartet die Bildaufnahme (z.B. Recorder bei voller Warteschlange).'''
+        self._listeners = self._listeners + [listener]
+
+    def remove_listener(self, listener):
+        self._listeners = [l for l in self._listeners if l is not listener]
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def _sleep(self, seconds):
+        self._wakeup.wait(seconds)
+        self._wakeup.clear()
+
+    def _reconnect(self):
+        ''' Kamera neu verbinden, bis zum Erfolg oder stop()'''
+        delay = self.reconnect_delay[0]
+        while not self._stop_event.is_set():
+            logging.warning('elmoCapture: camera lost, reconnect in {:.1f} s...'.format(delay))
+            self._sleep(delay)
+            self.commands.run_pending() # wartende Befehle nicht ewig blockieren (schlagen ggf. fehl)
+            try:
+                connected = self.cam.reconnect() != -1
+            except Exception as e:
+                logging.debug('elmoCapture: reconnect() exception: {}'.format(e))
+                connected = False
+            if connected:
+                logging.warning('elmoCapture: camera reconnected')
+                self.reconnects += 1
+                self._failures = 0
+                return
+            delay = min(2*delay, self.reconnect_delay[1])
+
+    def run(self):
+        logging.debug('elmoCapture: capture thread started...')
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            self.commands.run_pending() # Befehle nur zwischen zwei Bildübertragungen
+            try:
+                data = self.cam.get_image()
+            except Exception as e: # z.B. Gerät getrennt
+                logging.warning('elmoCapture: get_image() exception: {}'.format(e))
+                data = False
+            if data:
+                self.failed = False
+                self._failures = 0
+                self.frames += 1
+                self.slot.put(data)
+                if self.controller is not None:
+                    self.controller.update(len(data), sum(t[0] for t in self.cam.timing.values()))
+                for listener in self._listeners:
+                    try:
+                        listener(self.slot.seq, data)
+                    except Exception as e:
+                        logging.warning('elmoCapture: listener exception: {}'.format(e))
+            else:
+                self.failed = True
+                self.errors += 1
+                self._failures += 1
+                if getattr(self.cam, 'disconnected', False) or self._failures >= self.max_failures:
+                    self._reconnect()
+                else:
+                    self._sleep(0.05) # nach Fehler kurz warten statt Dauerschleife
+            wait = (self.idle_interval if self.idle else self.interval) - (time.monotonic() - start)
+            if wait > 0:
+                self._sleep(wait)
+        self.commands.run_pending() # z.B. zoom_stop noch senden
+        logging.debug('elmoCapture: capture thread stopped...')
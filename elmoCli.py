@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Bildaufnahme der Elmo L-12 über die Kommandozeile, ohne Bildschirm und pygame.
+Ein Bild, N Bilder oder ein fortlaufender Strom werden unverändert als JPEG
+nach stdout oder in Dateien geschrieben, z.B. für Skripte, cron-Jobs oder ffmpeg.
+
+Ausgabeformate:
+    raw     aneinandergehängte JPEG-Bilder (MJPEG, z.B. ffmpeg -f mjpeg -i -)
+    length  je Bild 4 Byte Länge (big-endian), dann die JPEG-Bytes
+
+Beispiele:
+    python3 elmoCli.py -o bild.jpg --autofocus
+    python3 elmoCli.py -n 10 --interval 2 -o serie_{:04d}.jpg
+    python3 elmoCli.py -n 0 --compression 40 | ffmpeg -f mjpeg -i - video.mp4
+"""
+
+import argparse
+import logging
+import sys
+import time
+import elmoCam
+import elmoCapture
+
+
+def open_output(path):
+    ''' Ausgabe für alle Bilder: stdout ("-") oder eine Datei, None für eine Datei je Bild'''
+    if path == '-':
+        return sys.stdout.buffer
+    if '{' in path:
+        return None
+    return open(path, 'wb')
+
+
+def write_frame(out, data, fmt):
+    if fmt == 'length':
+        out.write(len(data).to_bytes(4, 'big'))
+    out.write(data)
+    out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bilder der Elmo L-12 ohne Bildschirm aufnehmen')
+    parser.add_argument('-n', '--frames', type=int, default=1, help='Anzahl Bilder, 0 = fortlaufend bis Abbruch')
+    parser.add_argument('-o', '--output', default='-', help='Datei, "-" für stdout oder Muster mit {} für eine Datei je Bild (z.B. bild_{:04d}.jpg)')
+    parser.add_argument('--format', choices=['raw', 'length'], default='raw', help='Ausgabe als reines JPEG/MJPEG oder mit Längenangabe je Bild')
+    parser.add_argument('--compression', type=int, default=80, help='JPEG-Kompression 10-100')
+    parser.add_argument('--autofocus', action='store_true', help='vor der Aufnahme Autofokus auslösen')
+    parser.add_argument('--focus-delay', type=float, default=1.0, help='Wartezeit nach Autofokus in s')
+    parser.add_argument('--interval', type=float, default=0, help='Abstand zwischen zwei Bildern in s')
+    parser.add_argument('--timeout', type=float, default=10, help='Abbruch, falls so lange (s) kein Bild kommt')
+    elmoCam.add_arguments(parser)
+    parser.add_argument('--trace', default=None, help='USB-Verkehr in diese Datei aufzeichnen (elmoTrace)')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING) # Meldungen auf stderr
+    cam = elmoCam.open_from_args(args)
+    if args.trace:
+        cam.start_trace(args.trace)
+    cam.setCompression(args.compression)
+    if args.autofocus:
+        cam.autofocus()
+        time.sleep(args.focus_delay)
+
+    out = open_output(args.output)
+    capture = elmoCapture.CaptureThread(cam, interval=args.interval)
+    capture.start()
+    frames = 0
+    seq = 0
+    try:
+        while args.frames == 0 or frames < args.frames:
+            seq, data = capture.slot.get(seq, args.timeout) # neuestes Bild, langsame Ausgabe überspringt Bilder
+            if data is None:
+                sys.exit('Kein Bild von der Kamera nach {} s.'.format(args.timeout))
+            if out is None:
+                with open(args.output.format(frames), 'wb') as f:
+                    f.write(data)
+            else:
+                write_frame(out, data, args.format)
+            frames += 1
+    except (KeyboardInterrupt, BrokenPipeError): # Abbruch bzw. Empfänger beendet
+        pass
+    finally:
+        capture.stop()
+        capture.join(1)
+        cam.stop_trace()
+        if out is not None and out is not sys.stdout.buffer:
+            out.close()
+    logging.debug('elmoCli: {} frames written'.format(frames))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+JPEG-Decodierung und Skalierung der Kamerabilder außerhalb des UI-Threads.
+Ist das Fenster kleiner als das Kamerabild, decodiert PIL mittels Image.draft()
+direkt im DCT-Bereich auf 1/2, 1/4 oder 1/8 der Auflösung, so dass nur noch
+ein kleiner Rest skaliert werden muss.
+"""
+
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import pygame
+from PIL import Image
+from elmoCapture import FrameSlot
+try:
+    import numpy
+except ImportError: # ohne NumPy nur Erkennung identischer Bilder
+    numpy = None
+
+ROTATIONS = {90: Image.ROTATE_270, 180: Image.ROTATE_180, 270: Image.ROTATE_90} # im Uhrzeigersinn > PIL
+
+
+def image_format(size):
+    ''' Seitenverhältnis [Breite, Höhe] eines Bildes der Größe size (Toleranz 5%)'''
+    if (size[0]/4)*3*0.95 < size[1] and size[1] < (size[0]/4)*3*1.05:
+        im_format = [4, 3]
+    elif (size[0]/3)*4*0.95 < size[1] and size[1] < (size[0]/3)*4*1.05:
+        im_format = [3, 4]
+    elif (size[0]/5)*4*0.95 < size[1] and size[1] < (size[0]/5)*4*1.05:
+        im_format = [5, 4]
+    elif (size[0]/4)*5*0.95 < size[1] and size[1] < (size[0]/4)*5*1.05:
+        im_format = [4, 5]
+    elif (size[0]/16)*10*0.95 < size[1] and size[1] < (size[0]/16)*10*1.05:
+        im_format = [16, 10]
+    elif (size[0]/10)*16*0.95 < size[1] and size[1] < (size[0]/10)*16*1.05:
+        im_format = [10, 16]
+    elif (size[0]/9)*16*0.95 < size[1] and size[1] < (size[0]/9)*16*1.05:
+        im_format = [9, 16]
+    else:
+        im_format = [16, 9]
+    return im_format
+
+
+def fit_size(size, screen_size):
+    ''' Größe [Breite, Höhe] eines Bildes der Größe size eingepasst in screen_size'''
+    im_format = image_format(size)
+    if screen_size[0]/im_format[0] > screen_size[1]/im_format[1]:
+        height = screen_size[1]
+        width = (height/im_format[1])*im_format[0]
+    elif screen_size[0]/im_format[0] == screen_size[1]/im_format[1]:
+        width = screen_size[0]
+        height = screen_size[1]
+    else:
+        width = screen_size[0]
+        height = (width/im_format[0])*im_format[1]
+    return [int(width), int(height)]
+
+
+def decode_jpeg(data, screen_size=None, enhancer=None, rotation=0):
+    ''' JPEG-Bytes in pygame-Surface umwandeln, bei Angabe von screen_size
+    bereits auf die passende Fenstergröße verkleinert. enhancer (elmoEnhance.Enhancer)
+    bearbeitet das Bild nach dem Verkleinern, also nur in Fenstergröße.
+    rotation (0, 90, 180, 270 Grad im Uhrzeigersinn) dreht erst das verkleinerte Bild.'''
+    if rotation % 180 and screen_size is not None: # gedrehtes Bild in das Fenster einpassen
+        screen_size = (screen_size[1], screen_size[0])
+    pic, size = load_jpeg(data, screen_size)
+    return scale_to_surface(pic, size, enhancer, rotation)
+
+
+def load_jpeg(data, screen_size=None):
+    ''' JPEG decodieren, liefert (PIL-Bild, Zielgröße). Mit screen_size wird
+    per draft() mit 1/2, 1/4 oder 1/8 Auflösung decodiert, mind. aber in Zielgröße.'''
+    pic = Image.open(BytesIO(data))
+    size = list(pic.size)
+    if screen_size is not None:
+        size = fit_size(pic.size, screen_size)
+        pic.draft('RGB', size)
+    if pic.mode != 'RGB':
+        pic = pic.convert('RGB')
+    else:
+        pic.load()
+    return pic, size
+
+
+def scale_to_surface(pic, size, enhancer=None, rotation=0):
+    ''' PIL-Bild auf size skalieren, ggf. drehen und als pygame-Surface zurückgeben'''
+    if list(pic.size) != list(size):
+        pic = pic.resize(size, Image.BILINEAR)
+    if enhancer is not None:
+        pic = enhancer.apply_pil(pic)
+    if rotation % 360:
+        pic = pic.transpose(ROTATIONS[rotation % 360])
+    return pygame.image.frombuffer(pic.tobytes(), pic.size, 'RGB')
+
+
+class ChangeDetector:
+    ''' Erkennt, ob sich ein JPEG-Bild merklich vom zuletzt durchgelassenen Bild unterscheidet.
+    1. Hash der entropiecodierten Bilddaten (ab SOS-Marker): identische Bilder
+    2. Helligkeitsraster grid aus 1/8-Decodierung, mittlere Abweichung je Kachel (tile x tile)
+       mit NumPy, Änderung falls eine Kachel um mehr als threshold Graustufen abweicht.
+    Verglichen wird mit dem zuletzt als geändert erkannten Bild, so dass sich auch
+    langsame Änderungen aufsummieren.'''
+    def __init__(self, threshold=6.0, tile=8, grid=(64, 48)):
+        self.threshold = threshold
+        self.tile = tile
+        self.grid = grid
+        self.static_frames = 0 # Anzahl aufeinanderfolgender unveränderter Bilder
+        self.reset()
+
+    def reset(self):
+        ''' Nächstes Bild in jedem Fall als geändert melden'''
+        self._hash = None
+        self._luma = None
+
+    def changed(self, data):
+        sos = data.find(b'\xff\xda') # Start of Scan: ab hier entropiecodierte Daten
+        digest = hashlib.blake2b(memoryview(data)[max(sos, 0):], digest_size=16).digest()
+        if digest == self._hash:
+            return self._static()
+        luma = None
+        if numpy is not None:
+            pic = Image.open(BytesIO(data))
+            pic.draft('L', (pic.size[0]//8, pic.size[1]//8)) # Decodierung mit 1/8 Auflösung
+            luma = numpy.asarray(pic.convert('L').resize(self.grid, Image.BILINEAR), dtype=numpy.int16)
+            if self._luma is not None:
+                t = self.tile
+                diff = numpy.abs(luma - self._luma)
+                tiles = diff.reshape(diff.shape[0]//t, t, diff.shape[1]//t, t).mean(axis=(1, 3))
+                if tiles.max() <= self.threshold:
+                    return self._static()
+        self._hash = digest
+        self._luma = luma
+        self.static_frames = 0
+        return True
+
+    def _static(self):
+        self.static_frames += 1
+        return False
+
+
+class DecodeThread(threading.Thread):
+    ''' Holt neue JPEG-Bilder aus source (FrameSlot des Capture-Threads), decodiert
+    sie mit workers Threads parallel und legt fertige Surfaces in slot ab.
+    Die Zielgröße wird über screen_size (Fenstergröße) vorgegeben.'''
+    def __init__(self, source, workers=2):
+        threading.Thread.__init__(self, name='ElmoDecode', daemon=True)
+        self.source = source
+        self.slot = FrameSlot()
+        self.screen_size = None # None: volle Auflösung
+        self.detector = None # ChangeDetector: unveränderte Bilder nicht decodieren
+        self.paused = False # True: keine Bilder decodieren (z.B. Kamera nicht sichtbar)
+        self.enhancer = None # elmoEnhance.Enhancer: Dokumentaufbereitung in Fenstergröße
+        self.rotation = 0 # Drehung im Uhrzeigersinn in Grad, nach dem Verkleinern
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='ElmoDecodeWorker')
+        self._in_flight = threading.Semaphore(workers) # max. ein Bild pro Worker in Arbeit
+        self._lock = threading.Lock()
+        self._published = 0 # Nummer des zuletzt abgelegten Bildes
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def invalidate(self):
+        ''' Nächstes Bild auch ohne Änderung decodieren (z.B. nach Drehen oder Fenstergröße)'''
+        if self.detector is not None:
+            self.detector.reset()
+
+    def run(self):
+        seq = 0
+        while not self._stop_event.is_set():
+            seq, data = self.source.get(seq, 0.1)
+            if data is None or self.paused:
+                continue
+            if self.detector is not None and not self.detector.changed(data):
+                continue
+            self._in_flight.acquire()
+            self._pool.submit(self._decode, seq, data, self.screen_size, self.enhancer, self.rotation)
+        self._pool.shutdown(wait=False)
+
+    def _decode(self, seq, data, screen_size, enhancer, rotation):
+        try:
+            surface = decode_jpeg(data, screen_size, enhancer, rotation)
+            with self._lock:
+                if seq > self._published: # ältere Bilder nicht über neuere legen
+                    self._published = seq
+                    self.slot.put(surface)
+        except Exception as e:
+            logging.warning('elmoDecode: decode_jpeg() exception: {}'.format(e))
+        finally:
+            self._in_flight.release()
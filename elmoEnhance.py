@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Aufbereitung von Dokumentbildern mit NumPy: ungleichmäßige Beleuchtung ausgleichen
+(Hintergrund weiß), Tonwertkorrektur, Unscharfmaskierung und optional Umwandlung
+in Schwarz/Weiß. Alle Schritte arbeiten vektorisiert auf ganzen Arrays.
+Hintergrund und Tonwerte werden auf einem stark verkleinerten Helligkeitsbild
+geschätzt (ca. ESTIMATE_WIDTH Pixel breit) und als eine Verstärkungskarte plus
+Offset in voller Auflösung angewendet, die Unscharfmaskierung arbeitet nur auf der
+Helligkeit. So hält die Aufbereitung im Livebild mit der Bildrate Schritt.
+Einzelbilder werden in voller Auflösung bearbeitet und neu als JPEG codiert.
+"""
+
+from io import BytesIO
+import numpy
+from PIL import Image
+
+LUMA = numpy.array([0.299, 0.587, 0.114], dtype=numpy.float32)
+ESTIMATE_WIDTH = 320 # Breite des Helligkeitsbildes für Hintergrund und Tonwerte
+SHIFT_RADIUS = 4 # bis zu diesem Radius Weichzeichnung durch Summe verschobener Ansichten
+
+
+def luma(arr):
+    ''' Helligkeit (H, B) als float32 aus RGB-Array (H, B, 3)'''
+    return arr.astype(numpy.float32) @ LUMA
+
+
+def box_blur(arr, radius):
+    ''' Mittelwert über (2*radius+1)² Pixel, separierbar: bei kleinem Radius als Summe
+    verschobener Ansichten, sonst über kumulierte Summen'''
+    if radius < 1:
+        return arr
+    k = 2*radius+1
+    if radius <= SHIFT_RADIUS:
+        h, w = arr.shape[:2]
+        pad = [(radius, radius)]*2 + [(0, 0)]*(arr.ndim-2)
+        padded = numpy.pad(arr.astype(numpy.float32, copy=False), pad, mode='edge')
+        rows = padded[:, :w].copy()
+        for i in range(1, k):
+            rows += padded[:, i:i+w]
+        out = rows[:h].copy()
+        for i in range(1, k):
+            out += rows[i:i+h]
+        out /= k*k
+        return out
+    out = arr
+    for axis in (0, 1):
+        pad = [(0, 0)]*out.ndim
+        pad[axis] = (radius+1, radius)
+        c = numpy.cumsum(numpy.pad(out, pad, mode='edge'), axis=axis, dtype=numpy.float32)
+        n = out.shape[axis]
+        upper = [slice(None)]*out.ndim
+        lower = [slice(None)]*out.ndim
+        upper[axis] = slice(k, k+n)
+        lower[axis] = slice(0, n)
+        out = c[tuple(upper)] - c[tuple(lower)] # Differenzen als Ansichten, ohne Indexkopie
+        out /= k
+    return out
+
+
+def resize(l, size):
+    ''' float32-Array (H, B) bilinear auf size (Breite, Höhe) skalieren'''
+    return numpy.asarray(Image.fromarray(l.astype(numpy.float32)).resize(size, Image.BILINEAR))
+
+
+def background(l, block=32):
+    ''' Helligkeit des Papiers: Maximum je Block (Schrift ist dunkler als Papier),
+    geglättet und bilinear auf Bildgröße vergrößert'''
+    h, w = l.shape
+    bh, bw = max(1, h//block), max(1, w//block)
+    small = l[:bh*block, :bw*block].reshape(bh, block, bw, block).max(axis=(1, 3)) if h >= block and w >= block else l
+    return resize(box_blur(small, 1), (w, h))
+
+
+def flatten_background(arr, l=None, block=32):
+    ''' Beleuchtung ausgleichen: jedes Pixel durch die Hintergrundhelligkeit teilen'''
+    l = luma(arr) if l is None else l
+    scale = 255/numpy.maximum(background(l, block), 16)
+    return arr.astype(numpy.float32)*scale[..., None]
+
+
+def levels(l, low=1.0, high=99.0):
+    ''' (Faktor, Offset), so dass die Perzentile low und high von l auf 0 bzw. 255 liegen'''
+    lo, hi = numpy.percentile(l, (low, high))
+    if hi-lo < 1:
+        return 1.0, 0.0
+    return 255/(hi-lo), lo*255/(hi-lo)
+
+
+def auto_levels(arr, low=1.0, high=99.0):
+    ''' Tonwerte so spreizen, dass die Perzentile low und high auf 0 bzw. 255 liegen'''
+    scale, offset = levels(luma(arr[::4, ::4]), low, high) # Perzentile aus jedem 16. Pixel
+    return arr.astype(numpy.float32)*scale-offset
+
+
+def unsharp_mask(arr, amount=0.8, radius=2):
+    ''' Kanten betonen: Bild + amount*(Helligkeit - Weichzeichnung), nur auf der Helligkeit
+    berechnet und bei RGB-Bildern zu allen Kanälen addiert (keine Farbsäume)'''
+    arr = arr.astype(numpy.float32)
+    l = arr @ LUMA if arr.ndim == 3 else arr
+    detail = l-box_blur(l, radius)
+    detail *= amount
+    return arr + (detail[..., None] if arr.ndim == 3 else detail)
+
+
+def otsu_threshold(l):
+    ''' Schwelle nach Otsu aus dem Helligkeitshistogramm'''
+    hist = numpy.bincount(numpy.clip(l, 0, 255).astype(numpy.uint8).ravel(), minlength=256).astype(numpy.float64)
+    weight = numpy.cumsum(hist)
+    mean = numpy.cumsum(hist*numpy.arange(256))
+    total = weight[-1]
+    between = (mean[-1]*weight/total - mean)**2 / numpy.maximum(weight*(total-weight), 1)
+    return int(numpy.argmax(between))
+
+
+def binarize(arr, threshold=None):
+    ''' Schwarz/Weiß, Schwelle nach Otsu falls threshold None'''
+    l = luma(arr) if arr.ndim == 3 else arr
+    if threshold is None:
+        threshold = otsu_threshold(l[::4, ::4])
+    return numpy.repeat(numpy.where(l > threshold, 255, 0).astype(numpy.uint8)[..., None], 3, axis=2)
+
+
+class Enhancer:
+    ''' Einstellbare Folge der Aufbereitungsschritte für RGB-Bilder. Blockgröße und Radius
+    sind relativ zur Bildbreite, Vorschau in Fenstergröße und Einzelbild in voller
+    Auflösung sehen daher gleich aus.'''
+    def __init__(self, flatten=True, levels=True, sharpen=0.8, bw=False, blocks=40):
+        self.flatten = flatten
+        self.levels = levels
+        self.sharpen = sharpen # Stärke der Unscharfmaskierung, 0 = aus
+        self.bw = bw
+        self.blocks = blocks # Anzahl Blöcke der Hintergrundschätzung über die Bildbreite
+
+    def correction(self, l):
+        ''' Helligkeitskorrektur aus dem Helligkeitsbild l (H, B): (Verstärkung, Offset),
+        Verstärkung als Karte (H, B) bzw. Zahl ohne Hintergrundausgleich.
+        Geschätzt wird auf jedem step-ten Pixel, vergrößert wird nur die Verstärkungskarte.'''
+        h, w = l.shape
+        step = max(1, w//ESTIMATE_WIDTH)
+        small = l[::step, ::step]
+        gain = 1.0
+        if self.flatten:
+            gain = 255/numpy.maximum(background(small, max(2, small.shape[1]//self.blocks)), 16)
+            small = small*gain
+        scale, offset = levels(small) if self.levels else (1.0, 0.0)
+        if self.flatten:
+            gain *= scale
+            gain = resize(gain, (w, h)) if step > 1 else gain
+        else:
+            gain = scale
+        return gain, offset
+
+    def apply(self, arr):
+        ''' RGB-Array (H, B, 3) bearbeiten, liefert ein neues uint8-Array'''
+        width = arr.shape[1]
+        l = arr @ LUMA # float32 (H, B)
+        gain, offset = self.correction(l)
+        if not self.sharpen and not self.bw and not self.flatten: # nur Tonwerte: Tabelle je Grauwert
+            lut = numpy.clip(numpy.arange(256, dtype=numpy.float32)*gain-offset, 0, 255).astype(numpy.uint8)
+            return lut[arr]
+        l *= gain
+        l -= offset # Helligkeit nach der Korrektur (Korrektur wirkt auf alle Kanäle gleich)
+        detail = None
+        if self.sharpen:
+            detail = l-box_blur(l, max(1, round(width/640)))
+            detail *= self.sharpen
+        if self.bw:
+            if detail is not None:
+                l += detail
+            return binarize(l)
+        out = numpy.empty(arr.shape, numpy.float32)
+        numpy.multiply(arr, gain[..., None] if numpy.ndim(gain) else gain, out=out)
+        if detail is not None:
+            detail -= offset
+            out += detail[..., None]
+        else:
+            out -= offset
+        numpy.clip(out, 0, 255, out=out)
+        return out.astype(numpy.uint8)
+
+    def apply_pil(self, pic):
+        ''' PIL-Bild bearbeiten, liefert ein neues RGB-Bild'''
+        return Image.fromarray(self.apply(numpy.asarray(pic.convert('RGB'))))
+
+    def apply_jpeg(self, data, quality=95):
+        ''' JPEG-Bytes in voller Auflösung bearbeiten und neu codieren (für Einzelbilder)'''
+        buf = BytesIO()
+        self.apply_pil(Image.open(BytesIO(data))).save(buf, format='JPEG', quality=quality)
+        return buf.getvalue()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Bearbeitung von JPEG-Dateien auf Ebene der Marker-Segmente, ohne Decodierung.
+Gedrehte Einzelbilder erhalten ein EXIF-Orientierungs-Tag statt neu codiert zu
+werden: die Bilddaten der Kamera bleiben unverändert (keine Qualitätsverluste,
+keine Pixelarbeit in voller Auflösung), Bildbetrachter zeigen das Bild gedreht.
+frame_info() liest Bildgröße und Farbkanäle, z.B. für die PDF-Ausgabe (elmoPdf).
+"""
+
+import struct
+
+SOI = b'\xff\xd8'
+ORIENTATION = {0: 1, 90: 6, 180: 3, 270: 8} # Drehung im Uhrzeigersinn > EXIF Orientation
+
+
+def segments(data):
+    ''' Marker-Segmente vor den Bilddaten als Liste (Marker, Start, Ende), Ende exklusive.
+    Die Suche endet mit dem SOS-Segment (Start of Scan).'''
+    if data[:2] != SOI:
+        raise ValueError('no JPEG data')
+    result = []
+    pos = 2
+    while pos+4 <= len(data):
+        if data[pos] != 0xff:
+            raise ValueError('invalid JPEG marker at {}'.format(pos))
+        marker = data[pos+1]
+        if marker == 0xff: # Füllbyte
+            pos += 1
+            continue
+        length = struct.unpack_from('>H', data, pos+2)[0]
+        result.append((marker, pos, pos+2+length))
+        if marker == 0xda:
+            break
+        pos += 2+length
+    return result
+
+
+def exif_orientation(orientation):
+    ''' APP1-Segment mit minimalem EXIF-Block, der nur das Orientation-Tag enthält'''
+    tiff = b'II*\x00' + struct.pack('<I', 8) # Little Endian, erstes IFD direkt nach dem Kopf
+    tiff += struct.pack('<H', 1) + struct.pack('<HHIHH', 0x0112, 3, 1, orientation, 0) + struct.pack('<I', 0)
+    payload = b'Exif\x00\x00' + tiff
+    return b'\xff\xe1' + struct.pack('>H', len(payload)+2) + payload
+
+
+def set_orientation(data, rotation):
+    ''' JPEG-Bytes mit EXIF-Orientierung für rotation (0, 90, 180, 270 Grad im Uhrzeigersinn).
+    Vorhandene EXIF-Segmente werden ersetzt, die Bilddaten bleiben unverändert.'''
+    orientation = ORIENTATION[rotation % 360]
+    parts = [SOI]
+    pos = 2
+    inserted = False
+    for marker, start, end in segments(data):
+        if not inserted and marker != 0xe0: # nach JFIF-APP0, vor allen übrigen Segmenten
+            parts.append(exif_orientation(orientation))
+            inserted = True
+        if marker == 0xe1 and data[start+4:start+10] == b'Exif\x00\x00':
+            pos = end # bisheriges EXIF-Segment weglassen
+            continue
+        parts.append(data[pos:end])
+        pos = end
+    parts.append(data[pos:])
+    return b''.join(parts)
+
+
+def frame_info(data):
+    ''' (Breite, Höhe, Farbkanäle) aus dem SOF-Segment (Start of Frame)'''
+    for marker, start, end in segments(data):
+        if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc): # SOF0..SOF15 ohne DHT, JPG, DAC
+            height, width, components = struct.unpack_from('>HHB', data, start+5)
+            return width, height, components
+    raise ValueError('no SOF segment in JPEG data')
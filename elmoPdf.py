@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Mehrseitige PDF-Dokumente aus Kamerabildern (Scan-Modus von elmoUi).
+Jede Seite enthält die unveränderten JPEG-Bytes der Kamera als Bild mit
+/DCTDecode-Filter, es wird also nichts decodiert oder neu komprimiert.
+Seiten werden sofort an die Datei angehängt, im Speicher bleiben nur die
+Positionen der Objekte; close() schreibt Seitenbaum, Querverweistabelle und
+Trailer, so dass auch Dokumente mit vielen Seiten sofort fertig sind.
+Gedrehte Seiten erhalten /Rotate statt gedrehter Bilddaten.
+"""
+
+import logging
+import os
+import queue
+import threading
+import elmoJpeg
+
+COLORSPACES = {1: '/DeviceGray', 3: '/DeviceRGB', 4: '/DeviceCMYK'}
+
+
+class PdfWriter(threading.Thread):
+    ''' Schreibt Seiten im Hintergrund in die PDF-Datei path, eine Seite je put().
+    dpi bestimmt die Seitengröße aus der Bildgröße (Standard 150 dpi: 1920 Pixel ~ 32,5 cm).
+    Seiten, deren Bild noch aufgenommen wird, werden mit reserve() angekündigt; close()
+    schließt das Dokument erst, wenn für sie put() oder cancel() aufgerufen wurde.
+    put() blockiert nicht (maxsize=0: unbegrenzte Warteschlange, Seiten kommen einzeln per Taste).'''
+    def __init__(self, path, dpi=150, maxsize=0):
+        threading.Thread.__init__(self, name='ElmoPdfWriter', daemon=True)
+        self.path = path
+        self.dpi = dpi
+        self.pages = 0 # Anzahl geschriebener Seiten
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._reserved = 0 # angekündigte, noch nicht eingereihte Seiten
+        self._closing = False # close() aufgerufen, Abschluss sobald keine Seite mehr angekündigt
+        self._closed = False # Ende der Warteschlange eingereiht, weitere Seiten werden abgewiesen
+        self._offsets = {} # Objektnummer > Position in der Datei
+        self._kids = [] # Objektnummern der Seiten
+        self._next = 3 # 1 = Katalog, 2 = Seitenbaum (werden am Ende geschrieben)
+
+    def reserve(self):
+        ''' Seite ankündigen, deren Bild noch aufgenommen wird (danach put(reserved=True) oder cancel())'''
+        with self._lock:
+            self._reserved += 1
+
+    def cancel(self):
+        ''' Angekündigte Seite entfällt (Aufnahme fehlgeschlagen)'''
+        with self._lock:
+            self._reserved = max(0, self._reserved-1)
+            self._end()
+
+    def put(self, data, rotation=0, transform=None, reserved=False):
+        ''' JPEG-Bytes als neue Seite einreihen, rotation in Grad im Uhrzeigersinn.
+        transform(data) wird vorher im Writer-Thread aufgerufen (z.B. Aufbereitung).
+        Liefert False, falls das Dokument bereits abgeschlossen ist (Seite wird verworfen).'''
+        with self._lock:
+            if reserved:
+                self._reserved = max(0, self._reserved-1)
+            if self._closed:
+                logging.warning('elmoPdf: {} already closed, page dropped'.format(self.path))
+                return False
+            self._queue.put((data, rotation, transform))
+            self._end()
+        return True
+
+    def close(self, pending=True):
+        ''' Restliche Seiten schreiben und Dokument abschließen, mit pending erst nachdem alle
+        angekündigten Seiten eingereiht sind'''
+        with self._lock:
+            self._closing = True
+            if not pending:
+                self._reserved = 0
+            self._end()
+
+    def _end(self):
+        if self._closing and not self._reserved and not self._closed:
+            self._closed = True
+            self._queue.put(None)
+
+    def run(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.path, 'wb') as f:
+            f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                data, rotation, transform = item
+                try:
+                    if transform is not None:
+                        data = transform(data)
+                    self._page(f, data, rotation)
+                    f.flush()
+                    self.pages += 1
+                except Exception as e:
+                    logging.warning('elmoPdf: could not add page {}: {}'.format(self.pages+1, e))
+            self._finish(f)
+        logging.debug('elmoPdf: {} pages written to {}'.format(self.pages, self.path))
+
+    def _object(self, f, number, body, stream=None):
+        self._offsets[number] = f.tell()
+        f.write('{} 0 obj\n'.format(number).encode('ascii'))
+        f.write(body.encode('ascii'))
+        if stream is not None:
+            f.write(b'\nstream\n')
+            f.write(stream)
+            f.write(b'\nendstream')
+        f.write(b'\nendobj\n')
+
+    def _page(self, f, data, rotation):
+        width, height, components = elmoJpeg.frame_info(data) # erst prüfen, dann Objektnummern vergeben
+        if components not in COLORSPACES:
+            raise ValueError('unsupported number of color components: {}'.format(components))
+        if not (width and height):
+            raise ValueError('invalid image size {}x{}'.format(width, height))
+        image, content, page = self._next, self._next+1, self._next+2
+        self._next += 3
+        decode = ' /Decode [1 0 1 0 1 0 1 0]' if components == 4 else '' # Adobe-CMYK ist invertiert
+        self._object(f, image, '<< /Type /XObject /Subtype /Image /Width {} /Height {} /ColorSpace {} /BitsPerComponent 8{} /Filter /DCTDecode /Length {} >>'.format(
+            width, height, COLORSPACES[components], decode, len(data)), data)
+        w, h = width*72/self.dpi, height*72/self.dpi # Seitengröße in Punkt
+        drawing = 'q {:.2f} 0 0 {:.2f} 0 0 cm /Im0 Do Q'.format(w, h).encode('ascii')
+        self._object(f, content, '<< /Length {} >>'.format(len(drawing)), drawing)
+        self._object(f, page, '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {:.2f} {:.2f}] /Rotate {} /Resources << /XObject << /Im0 {} 0 R >> >> /Contents {} 0 R >>'.format(
+            w, h, rotation % 360, image, content))
+        self._kids.append(page)
+
+    def _finish(self, f):
+        self._object(f, 2, '<< /Type /Pages /Kids [{}] /Count {} >>'.format(' '.join('{} 0 R'.format(k) for k in self._kids), len(self._kids)))
+        self._object(f, 1, '<< /Type /Catalog /Pages 2 0 R >>')
+        xref = f.tell()
+        lines = ['xref', '0 {}'.format(self._next), '0000000000 65535 f ']
+        lines += ['{:010d} 00000 n '.format(self._offsets[n]) if n in self._offsets else '0000000000 00000 f ' # nicht geschrieben (Fehler)
+                  for n in range(1, self._next)]
+        f.write(('\n'.join(lines) + '\ntrailer\n<< /Size {} /Root 1 0 R >>\nstartxref\n{}\n%%EOF\n'.format(self._next, xref)).encode('ascii'))
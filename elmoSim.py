@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Simulierte Elmo L-12 Dokumentenkamera für Tests und Benchmarks ohne Hardware.
+Die Klasse SimulatedElmo verhält sich gegenüber elmoCam.Elmo wie ein pyusb-Gerät
+und bildet das in infoElmoProtokoll.md beschriebene Protokoll nach:
+Befehle über Endpunkte 0x02/0x81, Bilder über 0x04/0x83 in Portionen von max.
+0xfef8 Bytes mit 8 Byte Header. Das Kompressions-Byte (12) der Bildanforderung
+bestimmt die JPEG-Qualität. Latenz, Bandbreite, verlorene Portionen und Timeouts
+sind einstellbar.
+
+Verwendung:
+    cam = elmoCam.Elmo()
+    cam.connect(device=elmoSim.SimulatedElmo(latency=0.001))
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from array import array
+from collections import deque
+from io import BytesIO
+import usb.core
+from elmoCam import PACKET_SIZE, ERRNO_PIPE, ERRNO_TIMEOUT
+
+TIMEOUT_DEFAULT = 1000 # ms, wie pyusb bei timeout=None
+
+
+class UsbDevice:
+    ''' Grundgerüst eines pyusb-Geräts ohne Hardware (SimulatedElmo, elmoTrace.ReplayDevice):
+    die von elmoCam.Elmo außer write() und read() verwendeten Methoden und die Rückgabe
+    gelesener Daten wie bei pyusb (Anzahl Bytes bei Puffer, sonst array).'''
+    def is_kernel_driver_active(self, interface):
+        return False
+
+    def detach_kernel_driver(self, interface):
+        pass
+
+    def reset(self):
+        pass
+
+    def set_configuration(self):
+        pass
+
+    def clear_halt(self, endpoint):
+        pass
+
+    @staticmethod
+    def _size(size_or_buffer):
+        return len(size_or_buffer) if isinstance(size_or_buffer, array) else size_or_buffer
+
+    @staticmethod
+    def _result(size_or_buffer, data):
+        if isinstance(size_or_buffer, array):
+            size_or_buffer[:len(data)] = array('B', data)
+            return len(data)
+        return array('B', data)
+
+
+class SimulatedElmo(UsbDevice):
+    ''' Nachbildung des USB-Geräts einer Elmo L-12.
+    image:        JPEG-Datei oder JPEG-Bytes als Bildquelle
+    size:         (Breite, Höhe) auf die das Bild skaliert wird, None = Originalgröße
+    latency:      Verzögerung pro Lesevorgang in Sekunden
+    bandwidth:    Übertragungsrate in Bytes/s, None = unbegrenzt
+    drop_rate:    Wahrscheinlichkeit, dass eine Bildportion verloren geht
+    timeout_rate: Wahrscheinlichkeit, dass ein Lesevorgang mit Timeout abbricht
+    prepare:      Zeit in s von der Bildanforderung bis die Kamera das Bild sendet
+    '''
+    def __init__(self, image=None, size=None, latency=0.0, bandwidth=None, drop_rate=0.0, timeout_rate=0.0, seed=None, prepare=0.0):
+        if image is None:
+            image = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testbild.jpg')
+        if isinstance(image, str):
+            with open(image, 'rb') as f:
+                image = f.read()
+        self.image = bytes(image)
+        self.size = size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.drop_rate = drop_rate
+        self.timeout_rate = timeout_rate
+        self.prepare = prepare
+        self._ready = 0.0 # Zeitpunkt, ab dem das angeforderte Bild gesendet wird
+        self.random = random.Random(seed)
+        self.zooming = 0 # -1 zoom out, 0 stop, 1 zoom in
+        self.brightnessing = 0
+        self.requests = 0 # Anzahl Bildanforderungen
+        self._jpegs = {} # JPEG-Bytes je Kompressionswert
+        self._queues = {0x81: deque(), 0x83: deque()} # ausstehende Transfers je Endpunkt
+        self._lock = threading.Lock()
+
+    # pyusb-Schnittstelle, soweit von elmoCam.Elmo verwendet
+    def reset(self):
+        with self._lock:
+            for q in self._queues.values():
+                q.clear()
+
+    def write(self, endpoint, data, timeout=None):
+        data = bytes(data)
+        if endpoint == 0x02:
+            self._command(data)
+        elif endpoint == 0x04:
+            self._picture(data)
+        else:
+            raise usb.core.USBError('Pipe error', errno=ERRNO_PIPE)
+        return len(data)
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        if endpoint not in self._queues:
+            raise usb.core.USBError('Pipe error', errno=ERRNO_PIPE)
+        if self.latency:
+            time.sleep(self.latency)
+        if self.timeout_rate and self.random.random() < self.timeout_rate:
+            self._timeout(timeout)
+        size = self._size(size_or_buffer)
+        if endpoint == 0x83 and time.monotonic() < self._ready: # Bild noch nicht bereit
+            wait = self._ready-time.monotonic()
+            if wait > (timeout if timeout else TIMEOUT_DEFAULT)/1000: # wie echte Kamera: Timeout
+                self._timeout(timeout)
+            time.sleep(wait)
+        with self._lock:
+            q = self._queues[endpoint]
+            if q:
+                transfer = q.popleft()
+                data = transfer[:size] # Bulk-Transfer endet am Ende der Portion
+                if len(transfer) > size:
+                    q.appendleft(transfer[size:])
+            else:
+                data = None
+        if data is None:
+            self._timeout(timeout)
+        if self.bandwidth:
+            time.sleep(len(data)/self.bandwidth)
+        return self._result(size_or_buffer, data)
+
+    # Protokoll
+    def _timeout(self, timeout):
+        time.sleep((timeout if timeout else TIMEOUT_DEFAULT)/1000)
+        raise usb.core.USBError('Operation timed out', errno=ERRNO_TIMEOUT)
+
+    def _command(self, data):
+        reply = bytearray(32)
+        reply[0] = 0x01
+        reply[4] = 0x18
+        cmd = data[8]
+        if cmd == 0x10: # version
+            reply[12:16] = b'L-12'
+        elif cmd == 0xE0: # zoom
+            self.zooming = {0: 0, 1: 1, 2: -1}.get(data[12], 0)
+        elif cmd == 0xE2: # brightness
+            self.brightnessing = {2: 1, 3: -1}.get(data[12], 0)
+        with self._lock:
+            self._queues[0x81].append(bytes(reply))
+
+    def _picture(self, data):
+        if data[8:10] != b'\x8e\x80':
+            raise usb.core.USBError('Pipe error', errno=ERRNO_PIPE)
+        jpeg = self.jpeg(max(10, min(100, data[12])))
+        self.requests += 1
+        reply = bytearray(32)
+        reply[0] = 0x20
+        reply[4] = 0x18
+        reply[8:12] = len(jpeg).to_bytes(4, 'little')
+        transfers = [bytes(reply)]
+        # Portionen mit Header 0200 0000 DDDD 0000, letzte Portion kleiner 0xfef8 (ggf. leer)
+        for i in range(0, len(jpeg)+1, PACKET_SIZE):
+            payload = jpeg[i:i+PACKET_SIZE]
+            if self.drop_rate and self.random.random() < self.drop_rate:
+                logging.debug('elmoSim: drop packet at offset {}'.format(i))
+                continue
+            transfers.append(b'\x02\x00\x00\x00' + len(payload).to_bytes(2, 'little') + b'\x00\x00' + payload)
+        with self._lock:
+            self._ready = time.monotonic()+self.prepare
+            self._queues[0x83].extend(transfers)
+
+    def jpeg(self, compression):
+        ''' Testbild mit der zum Kompressionswert passenden JPEG-Qualität'''
+        if compression not in self._jpegs:
+            try:
+                from PIL import Image
+                pic = Image.open(BytesIO(self.image))
+                if self.size is not None:
+                    pic = pic.resize(self.size, Image.BILINEAR)
+                buf = BytesIO()
+                pic.convert('RGB').save(buf, format='JPEG', quality=compression)
+                self._jpegs[compression] = buf.getvalue()
+            except ImportError: # ohne PIL unverändertes Bild senden
+                self._jpegs[compression] = self.image
+        return self._jpegs[compression]
+
+
+def check(prepare=0.06, frames=24):
+    ''' Pipeline-Betrieb mit Kamera, die prepare s bis zum Senden braucht: jedes Bild muss zur
+    aktuellen Kompression passen, auch nach Wechsel der Kompression, Einzelbild (snapshot)
+    und Steuerbefehl zwischen den Bildern. Liefert die Anzahl falscher Bilder.'''
+    import elmoCam
+    sim = SimulatedElmo(size=(640, 480), prepare=prepare)
+    cam = elmoCam.Elmo()
+    cam.connect(device=sim)
+    cam.pipelined = True
+    wrong = 0
+    for i in range(frames):
+        cam.setCompression(30 if i % 6 < 3 else 60)
+        if i % 4 == 3:
+            cam.autofocus()
+        if i % 5 == 4:
+            data, compression = cam.snapshot(95), 95
+        else:
+            data, compression = cam.get_image(), cam.compression
+        if data and bytes(data) != sim.jpeg(compression):
+            logging.warning('elmoSim: frame {} does not match compression {}'.format(i, compression))
+            wrong += 1
+    return wrong
+
+
+if __name__ == '__main__':
+    import elmoCam
+    cam = elmoCam.Elmo()
+    cam.connect(device=SimulatedElmo(size=(1920, 1440), bandwidth=30e6))
+    start = time.monotonic()
+    frames = sum(1 for i in range(20) if cam.get_image())
+    print('{} frames in {:.2f} s'.format(frames, time.monotonic()-start))
+    print('pipelined with prepare 60 ms: {} wrong frames'.format(check()))
@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+MJPEG-Streaming der Elmo L-12 über HTTP ohne Bildschirm (z.B. für weitere
+Räume oder Aufzeichnungen). Die JPEG-Bilder der Kamera werden unverändert als
+multipart/x-mixed-replace an beliebig viele Browser/Clients verteilt.
+Die Kamera wird nur einmal pro Bild abgefragt, jeder Client hat eine eigene
+kleine Warteschlange, in der bei langsamer Verbindung das älteste Bild verworfen
+wird, so dass ein langsamer Client die Kamera nicht ausbremst.
+
+Aufruf: python3 elmoStream.py --port 8080
+Stream: http://<rechner>:8080/stream.mjpg, Einzelbild: /snapshot.jpg
+"""
+
+import argparse
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import elmoCam
+import elmoCapture
+
+BOUNDARY = 'elmoframe'
+PAGE = """<html><head><title>Elmo L-12</title></head>
+<body style="margin:0;background:#303030"><img src="/stream.mjpg" style="width:100%"></body></html>
+"""
+
+
+class ClientQueue:
+    ''' Warteschlange eines Clients mit fester Länge, volle Schlange verwirft das älteste Bild'''
+    def __init__(self, depth=2):
+        self._frames = deque(maxlen=depth)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, frame):
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(frame)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames, timeout):
+                return None
+            return self._frames.popleft()
+
+
+class FrameBroadcaster:
+    ''' Verteilt jedes Bild des Capture-Threads an alle angemeldeten Clients'''
+    def __init__(self, capture, max_clients=50, depth=2):
+        self.capture = capture
+        self.max_clients = max_clients
+        self.depth = depth
+        self._clients = []
+        self._lock = threading.Lock()
+        capture.add_listener(self._publish)
+
+    def _publish(self, seq, frame):
+        for client in self._clients:
+            client.put(frame)
+
+    def subscribe(self):
+        ''' Neue ClientQueue oder None falls die maximale Anzahl Clients erreicht ist'''
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                return None
+            client = ClientQueue(self.depth)
+            self._clients = self._clients + [client]
+            return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients = [c for c in self._clients if c is not client]
+
+    def clients(self):
+        return len(self._clients)
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    broadcaster = None # wird in serve() gesetzt
+
+    def do_GET(self):
+        if self.path == '/':
+            self._send(200, 'text/html; charset=utf-8', PAGE.encode('utf-8'))
+        elif self.path == '/snapshot.jpg':
+            seq, frame = self.broadcaster.capture.slot.latest()
+            if frame is None:
+                self.send_error(503, 'No image from camera')
+            else:
+                self._send(200, 'image/jpeg', frame)
+        elif self.path == '/stream.mjpg':
+            self._stream()
+        else:
+            self.send_error(404)
+
+    def _send(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        client = self.broadcaster.subscribe()
+        if client is None:
+            self.send_error(503, 'Too many clients')
+            return
+        logging.info('elmoStream: client {} connected ({} clients)'.format(self.client_address[0], self.broadcaster.clients()))
+        try:
+            self.send_response(200)
+            self.send_header('Cache-Control', 'no-cache, private')
+            self.send_header('Pragma', 'no-cache')
+            self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=' + BOUNDARY)
+            self.end_headers()
+            while not self.broadcaster.capture.stopped():
+                frame = client.get(1.0)
+                if frame is None:
+                    continue
+                self.wfile.write('--{}\r\nContent-Type: image/jpeg\r\nContent-Length: {}\r\n\r\n'.format(BOUNDARY, len(frame)).encode('ascii'))
+                self.wfile.write(frame)
+                self.wfile.write(b'\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.broadcaster.unsubscribe(client)
+            logging.info('elmoStream: client {} disconnected, {} frames dropped'.format(self.client_address[0], client.dropped))
+
+    def log_message(self, format, *args):
+        logging.debug('elmoStream: ' + format % args)
+
+
+def serve(capture, bind='', port=8080, max_clients=50):
+    ''' HTTP-Server für den Capture-Thread capture starten, blockiert bis KeyboardInterrupt'''
+    StreamHandler.broadcaster = FrameBroadcaster(capture, max_clients)
+    server = ThreadingHTTPServer((bind, port), StreamHandler)
+    server.daemon_threads = True
+    logging.warning('elmoStream: serving on port {}...'.format(port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='MJPEG-Streaming der Elmo L-12 über HTTP')
+    parser.add_argument('--bind', default='', help='Adresse, Standard alle')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-clients', type=int, default=50, help='maximale Anzahl gleichzeitiger Streams')
+    parser.add_argument('--compression', type=int, default=60, help='JPEG-Kompression 10-100')
+    parser.add_argument('--fps', type=float, default=0, help='maximale Bildrate, 0 = so schnell wie möglich')
+    elmoCam.add_arguments(parser, port='--usb-port') # --port ist der HTTP-Port
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    cam = elmoCam.open_from_args(args)
+    cam.setCompression(args.compression)
+    capture = elmoCapture.CaptureThread(cam, interval=1/args.fps if args.fps else 0)
+    capture.start()
+    try:
+        serve(capture, args.bind, args.port, args.max_clients)
+    finally:
+        capture.stop()
+        capture.join(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Aufzeichnung und Wiedergabe des USB-Verkehrs einer Elmo L-12.
+TraceRecorder wird zwischen elmoCam.Elmo und das pyusb-Gerät geschaltet und
+schreibt jeden write()/read()-Aufruf (Endpunkt, Länge, Zeitpunkt, Dauer, Daten)
+bzw. jeden USB-Fehler in eine kompakte Binärdatei. ReplayDevice verhält sich wie
+ein pyusb-Gerät und liefert die aufgezeichneten Daten in Originalgeschwindigkeit,
+beschleunigt (speed > 1) oder ohne Wartezeiten (speed = 0), z.B. um Aufnahmen
+einer langsamen oder fehlerhaften Kamera als Benchmark (elmoBench --replay) oder
+zur Fehlersuche ohne Hardware wiederholbar abzuspielen.
+
+Dateiformat: 8 Byte Kennung, dann je Aufruf ein Datensatz
+    Art (B), Endpunkt (B), Start (d), Dauer (d), angefordert (I), Länge (I), Daten
+Art 0 = write, 1 = read, 2 = Fehler (angefordert = errno, Daten = Fehlertext).
+
+Aufruf:
+    python3 elmoTrace.py record session.elmotrace --frames 100
+    python3 elmoTrace.py info session.elmotrace
+"""
+
+import argparse
+import logging
+import struct
+import threading
+import time
+from array import array
+import usb.core
+from elmoCam import ERRNO_NO_DEVICE, ERRNO_TIMEOUT
+from elmoSim import UsbDevice
+
+MAGIC = b'ELMOTRC\x01'
+RECORD = struct.Struct('<BBddII')
+WRITE, READ, ERROR = 0, 1, 2
+
+
+class TraceRecorder:
+    ''' pyusb-Gerät device, dessen Transfers in die Datei path aufgezeichnet werden.
+    Alle übrigen Attribute und Methoden werden unverändert an device weitergereicht.'''
+    def __init__(self, device, path):
+        self.device = device
+        self.path = path
+        self.records = 0
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def __getattr__(self, name):
+        return getattr(self.device, name)
+
+    def _record(self, kind, endpoint, start, requested, data):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(RECORD.pack(kind, endpoint, start-self._start, time.perf_counter()-start, requested, len(data)))
+            self._file.write(data)
+            self.records += 1
+
+    def _error(self, endpoint, start, e):
+        self._record(ERROR, endpoint, start, e.errno or 0, str(e.strerror or e).encode('utf-8'))
+
+    def write(self, endpoint, data, timeout=None):
+        start = time.perf_counter()
+        try:
+            result = self.device.write(endpoint, data, timeout)
+        except usb.core.USBError as e:
+            self._error(endpoint, start, e)
+            raise
+        self._record(WRITE, endpoint, start, len(data), bytes(data))
+        return result
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        start = time.perf_counter()
+        requested = len(size_or_buffer) if isinstance(size_or_buffer, array) else size_or_buffer
+        try:
+            result = self.device.read(endpoint, size_or_buffer, timeout)
+        except usb.core.USBError as e:
+            self._error(endpoint, start, e)
+            raise
+        if isinstance(size_or_buffer, array):
+            data = memoryview(size_or_buffer)[:result].tobytes()
+        else:
+            data = result.tobytes()
+        self._record(READ, endpoint, start, requested, data)
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        logging.debug('elmoTrace: {} records written to {}'.format(self.records, self.path))
+
+
+def load(path):
+    ''' Datensätze einer Trace-Datei als Liste (Art, Endpunkt, Start, Dauer, angefordert, Daten)'''
+    with open(path, 'rb') as f:
+        content = f.read()
+    if not content.startswith(MAGIC):
+        raise ValueError('{} is no Elmo trace file'.format(path))
+    records = []
+    pos = len(MAGIC)
+    while pos+RECORD.size <= len(content):
+        kind, endpoint, start, duration, requested, length = RECORD.unpack_from(content, pos)
+        pos += RECORD.size
+        records.append((kind, endpoint, start, duration, requested, content[pos:pos+length]))
+        pos += length
+    return records
+
+
+class ReplayDevice(UsbDevice):
+    ''' Wiedergabe einer Trace-Datei als pyusb-Gerät für elmoCam.Elmo.connect(device=...).
+    Jedes write() springt zum nächsten aufgezeichneten write (Inhalt wird nicht verglichen,
+    z.B. andere Kompression), read() liefert die folgenden Daten des Endpunkts; liest der
+    Aufrufer in anderen Portionen als bei der Aufnahme, werden Transfers wie beim Gerät
+    geteilt bzw. zusammengesetzt. Aufgezeichnete Fehler werden erneut ausgelöst.
+    Am Ende der Aufnahme beginnt die Wiedergabe mit loop von vorn, sonst meldet sie
+    eine getrennte Kamera.'''
+    def __init__(self, path, speed=1.0, loop=False):
+        self.records = load(path)
+        self.speed = speed
+        self.loop = loop
+        self.position = 0 # nächster Datensatz
+        self.rest = None # nicht abgeholter Teil eines gelesenen Datensatzes
+        self._lock = threading.Lock()
+
+    def _wait(self, duration):
+        if self.speed:
+            time.sleep(duration/self.speed)
+
+    def _next(self):
+        if self.position >= len(self.records):
+            if not self.loop or not self.records:
+                raise usb.core.USBError('End of trace', errno=ERRNO_NO_DEVICE)
+            self.position = 0
+        record = self.records[self.position]
+        self.position += 1
+        return record
+
+    def write(self, endpoint, data, timeout=None):
+        with self._lock:
+            self.rest = None
+            while True:
+                kind, ep, start, duration, requested, payload = self._next()
+                if kind == WRITE or (kind == ERROR and ep == endpoint):
+                    break
+            self._wait(duration)
+            if kind == ERROR:
+                raise usb.core.USBError(payload.decode('utf-8'), errno=requested)
+            return len(data)
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        size = self._size(size_or_buffer)
+        with self._lock:
+            data = b''
+            while len(data) < size:
+                if self.rest is not None: # Rest eines teilweise gelesenen Transfers
+                    payload, requested, self.rest = self.rest[0], self.rest[1], None
+                else:
+                    if self.position >= len(self.records) and data:
+                        break
+                    if self.position < len(self.records) and self.records[self.position][0] == WRITE:
+                        if data:
+                            break
+                        self._wait((timeout if timeout else 1000)/1000) # Gerät sendet nichts mehr
+                        raise usb.core.USBError('Operation timed out', errno=ERRNO_TIMEOUT)
+                    kind, ep, start, duration, requested, payload = self._next()
+                    self._wait(duration)
+                    if kind == ERROR:
+                        raise usb.core.USBError(payload.decode('utf-8'), errno=requested)
+                take = size-len(data)
+                data += payload[:take]
+                if len(payload) > take:
+                    self.rest = (payload[take:], requested-take)
+                    break
+                if len(payload) < requested: # kurzer Transfer > Ende der Portion
+                    break
+        return self._result(size_or_buffer, data)
+
+
+def summary(records):
+    ''' Kennzahlen einer Aufnahme: Anzahl Transfers, Bytes, Fehler, Dauer'''
+    reads = [r for r in records if r[0] == READ]
+    errors = {}
+    for r in records:
+        if r[0] == ERROR:
+            errors[r[4]] = errors.get(r[4], 0)+1
+    return {
+        'records': len(records),
+        'writes': sum(1 for r in records if r[0] == WRITE),
+        'reads': len(reads),
+        'read_bytes': sum(len(r[5]) for r in reads),
+        'read_seconds': sum(r[3] for r in reads),
+        'errors': errors,
+        'seconds': records[-1][2]+records[-1][3] if records else 0,
+    }
+
+
+def main(argv=None):
+    import elmoCam
+    parser = argparse.ArgumentParser(description='USB-Verkehr der Elmo L-12 aufzeichnen oder auswerten')
+    sub = parser.add_subparsers(dest='command', required=True)
+    record = sub.add_parser('record', help='Bilder von der Kamera holen und aufzeichnen')
+    record.add_argument('path')
+    record.add_argument('--frames', type=int, default=100)
+    record.add_argument('--compression', type=int, default=60, help='JPEG-Kompression 10-100')
+    elmoCam.add_arguments(record)
+    info = sub.add_parser('info', help='Kennzahlen einer Aufzeichnung ausgeben')
+    info.add_argument('path')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.command == 'info':
+        for key, value in summary(load(args.path)).items():
+            print('{}: {}'.format(key, value))
+        return
+    cam = elmoCam.open_from_args(args)
+    cam.setCompression(args.compression)
+    cam.start_trace(args.path)
+    try:
+        frames = sum(1 for i in range(args.frames) if cam.get_image())
+    finally:
+        cam.stop_trace()
+    print('{} of {} frames recorded to {}'.format(frames, args.frames, args.path))
+
+
+if __name__ == '__main__':
+    main()
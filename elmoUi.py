@@ -19,21 +19,25 @@ geänder werden.´
 
 S. Mack, 6.5.21
 
+Start über main(): beim Import (z.B. durch elmoBench) wird nichts initialisiert.
+Das Fenster öffnet sofort mit einem Platzhalter, USB-Verbindung und erstes Bild
+laufen im Hintergrund (StartupThread). Startzeit bis zum ersten Bild messen:
+    python3 elmoUi.py --startup-time >> startup.txt
 """
 
+import time
+STARTED = time.perf_counter() # Bezugszeitpunkt für --startup-time (vor den übrigen Imports)
+import argparse
+import json
 import logging
-import pygame, datetime, os #, time
+import functools
+import math
+import threading
+import pygame #, datetime, os, time
 from pygame.locals import RESIZABLE, MOUSEBUTTONDOWN
-from PIL import Image
-from io import BytesIO
-import elmoCam
-
-# Nachfolgende Zeile für Debugmeldungen ausschalten (level=0 bedeutet alle Meldungen)
-# DEBUG 10, INFO 20, WARNING 30
-logging.basicConfig(level=logging.WARNING)
-#logging.basicConfig(filename='logDatei.log', level=logging.WARNING)
-
-pygame.init() #init pygame
+import elmoCapture
+import elmoDecode
+import elmoWriter
 
 ########################
 # set fonts and colors #
@@ -54,10 +58,8 @@ DGRAY = (48, 48, 48)
 # global vars #
 ###############
 version = "1.1"
-disp_info = pygame.display.Info()
-rotate = False
-rotate_90 = 0
-rotate_90_changed = False
+disp_info = None # pygame.display.Info(), in main() abgefragt
+rotation = 0 # Drehung des Bildes im Uhrzeigersinn in Grad (0, 90, 180, 270)
 display_help = False
 display_menue = True
 image_size = None
@@ -65,14 +67,50 @@ image = None
 screen_res = None
 screen = None
 cam_connect = -1
+cam = None # angezeigte Kamera (elmoCam.Elmo bzw. elmoBus.BusCamera)
 error_no_elmo = True
 error_no_image = True
 buttons = {}
+overlay = None # vorgerenderte Menü-/Hilfe-Overlays (OverlayCache)
+renderer = None # zeichnet nur geänderte Fensterbereiche (Renderer)
+cameras = [] # alle angeschlossenen Kameras (CameraPipeline)
+active_camera = 0 # Index der angezeigten Kamera
+tiled = False # True: alle Kameras nebeneinander anzeigen
+mosaic = None # Gesamtbild der Kachelansicht
+frozen = None # Standbild: Liste (Zeitstempel, JPEG-Bytes) aus dem Ringpuffer, sonst None
+frozen_index = 0 # angezeigtes Bild in frozen
+frozen_changed = False # True: Standbild neu decodieren
+enhancer = None # elmoEnhance.Enhancer für Dokumentaufbereitung, None = aus
+scan = None # elmoPdf.PdfWriter der laufenden Scan-Sitzung, None = Einzelbilder als JPEG
+scan_pages = 0 # Anzahl der in der Scan-Sitzung aufgenommenen Seiten
+capture = None # Thread für Bildaufnahme der angezeigten Kamera, liefert neuestes Bild
+decoder = None # Threads für JPEG-Decodierung, liefern fertig skalierte Bilder
+frame_seq = 0 # Nummer des zuletzt dargestellten Bildes
+IDLE_FRAMES = 20 # nach so vielen unveränderten Bildern Kamera seltener abfragen
+manual_compression = 60 # jpg-Qualität vor Einschalten der Automatik
+writer = None # Thread zum Speichern der Bilder (ImageWriter)
+recorders = [] # laufende Bildserien/Zeitraffer (elmoWriter.Recorder)
+timelapse = None # laufender Zeitraffer
+BURST_FRAMES = 20 # Anzahl Bilder einer Serie (Ctrl+B)
+TIMELAPSE_INTERVAL = 5 # Sekunden zwischen zwei Zeitraffer-Bildern (Ctrl+L)
 ui_running = True # Flag True solange UI nicht durch User beendet
+startup = None # StartupThread, solange Kameras im Hintergrund verbunden werden
+startup_times = {} # Zeitpunkte des Starts in s seit STARTED (--startup-time)
+PLACEHOLDER_SIZE = (1280, 960) # Platzhalter bis zum ersten Bild, Seitenverhältnis der Elmo L-12
 
 #############
 # functions #
 #############
+#font objects are created only once per (name, size, bold)
+@functools.lru_cache(maxsize=None)
+def get_font(name, size, bold=False):
+    if name: # Systemschrift: Suche aller installierten Schriften beim ersten Aufruf
+        font = pygame.font.SysFont(name, size)
+    else: # Standardschrift von pygame ohne Schriftsuche (schnellerer Start)
+        font = pygame.font.Font(None, size)
+    font.set_bold(bold)
+    return font
+
 #draw help-window with commands on the screen 
 def draw_help(screen, screen_size, version, font, color_background, color_font):
     #define string to display 
@@ -82,10 +120,17 @@ def draw_help(screen, screen_size, version, font, color_background, color_font):
                 Display Help: Ctrl+H, F1  
                 Exit Help: Ctrl+H, F1, Escape\n
                 Show/Hide Menue: Crtl+M\n
-                Rotate Image 180 Degree: Ctrl+T"""
-                   #Rotate Image 90 Degree: Ctrl+R\n
-    my_string += """\n
-                Save Image: Ctrl+S\n\n
+                Rotate Image 180 Degree: Ctrl+T
+                Rotate Image 90 Degree: Ctrl+R\n
+                Save Image: Ctrl+S
+                Save Image Series: Ctrl+B
+                Time-lapse start/stop: Ctrl+L\n
+                Next Camera: Ctrl+N
+                Show all Cameras on/off: Ctrl+W\n
+                Freeze Image on/off: Ctrl+F
+                Previous/Next buffered Image: Left/Right
+                Enhance Document on/b&w/off: Ctrl+E
+                Scan to PDF start/finish: Ctrl+P (Ctrl+S adds page)\n\n
                 Camera options:\n
                 Zoom in start/stop: Ctrl+C
                 Zoom out start/stop: Ctrl+V\n
@@ -94,7 +139,8 @@ def draw_help(screen, screen_size, version, font, color_background, color_font):
                 Brightness down start/stop: Ctrl+X\n
                 Autofocus: Ctrl+A\n
                 Image Quality UP: Crtl+U
-                Image Quality Down: Crtl+Z\n\n
+                Image Quality Down: Crtl+Z
+                Auto Image Quality on/off: Ctrl+O\n\n
                 Elmo User Interface - Version """+version
                 
     #define resolution of the rectangle
@@ -110,7 +156,7 @@ def draw_help(screen, screen_size, version, font, color_background, color_font):
     while not fits:
         try:
             #render the text for the rectangle
-            rendered_text = render_textrect(my_string, pygame.font.SysFont(font, font_size), textRect, color_font, color_background, 0)
+            rendered_text = render_textrect(my_string, get_font(font, font_size), textRect, color_font, color_background, 0)
             fits = True
         except:
             font_size = font_size - 1
@@ -175,45 +221,18 @@ def draw_menue(screen, screen_size, buttons, error_no_elmo, font, color_backgrou
         buttons["quality_down"] = Button()
         buttons["quality_down"].create_button(screen, color_background, 0, counter*button_height, button_width, button_height, 0, "Image Quality Down", color_font, font, font_size, bold)
         counter += 2
+        buttons["quality_auto"] = Button()
+        buttons["quality_auto"].create_button(screen, color_background, 0, counter*button_height, button_width, button_height, 0, "Auto Quality on/off", color_font, font, font_size, bold)
+        counter += 2
     return buttons
 
 #get image format
 def get_image_format(image):
-    size = image.get_size()
-    if (size[0]/4)*3*0.95 < size[1] and size[1] < (size[0]/4)*3*1.05:
-        im_format = [4, 3]
-    elif (size[0]/3)*4*0.95 < size[1] and size[1] < (size[0]/3)*4*1.05:
-        im_format = [3, 4]
-    elif (size[0]/5)*4*0.95 < size[1] and size[1] < (size[0]/5)*4*1.05:
-        im_format = [5, 4]
-    elif (size[0]/4)*5*0.95 < size[1] and size[1] < (size[0]/4)*5*1.05:
-        im_format = [4, 5]
-    elif (size[0]/16)*10*0.95 < size[1] and size[1] < (size[0]/16)*10*1.05:
-        im_format = [16, 10]
-    elif (size[0]/10)*16*0.95 < size[1] and size[1] < (size[0]/10)*16*1.05:
-        im_format = [10, 16]
-    elif (size[0]/9)*16*0.95 < size[1] and size[1] < (size[0]/9)*16*1.05:
-        im_format = [9, 16]
-    else:
-        im_format = [16, 9]
-    return im_format
+    return elmoDecode.image_format(image.get_size())
         
 #resize image
 def resize_image(image, screen):
-    #calculate actual sizes 
-    im_format = get_image_format(image)
-    screen_size = screen.get_size()
-    #calculate the new image size
-    if screen_size[0]/im_format[0] > screen_size[1]/im_format[1]:
-        height = screen_size[1]
-        width = (height/im_format[1])*im_format[0]
-    elif screen_size[0]/im_format[0] == screen_size[1]/im_format[1]:
-        width = screen_size[0]
-        height = screen_size[1]
-    elif screen_size[0]/im_format[0] < screen_size[1]/im_format[1]:
-        width = screen_size[0]
-        height = (width/im_format[0])*im_format[1]   
-    return [int(width), int(height)]
+    return elmoDecode.fit_size(image.get_size(), screen.get_size())
 
 #get the padding for .blit(image, (x,y))
 def get_image_padding(image, screen):
@@ -223,19 +242,77 @@ def get_image_padding(image, screen):
     y = (screen_size[1]-image_size[1])/2
     return [x, y]
 
-def save_image_to_file(cam): # für Windows bei Pfadangabe auf Backslash ändern
-    if cam.test: return
-    if cam.connect() != -1:
-        directory = "ElmoScreenShots" # Verzeichnis Screenshots im Arbeitsverzeichnis
-        if not os.path.exists(directory):
-            os.makedirs(directory) 
-        compression = cam.getCompression()
-        cam.setCompression(80) # jpg-Qualität erhöhen falls <80
-        data = cam.get_image()
-        stream = BytesIO(data)                                    
-        pic = Image.open(stream)
-        pic.save('ElmoScreenShots/elmo_image'+datetime.datetime.now().strftime("%Y%m%d_%H%M%S")+'.jpg')
-        cam.setCompression(compression) # ursprüngliche jpg-Qualität einstellen
+def save_image_to_file(cam): # Einzelbild über bestehende Verbindung, Schreiben im Hintergrund
+    if frozen is not None: # Standbild: gepuffertes Bild ohne Kamera speichern
+        still_saver()(frozen[frozen_index][1])
+        return
+    if cam is None or cam.test or capture is None: return
+    if capture.controller is not None: # Automatik: Einzelbild in max. Qualität
+        compression = capture.controller.still_compression
+    else:
+        compression = 80 # jpg-Qualität erhöhen falls <80
+    future = command('snapshot', compression)
+    save = still_saver()
+    def write(future):
+        ok = not future.cancelled() and future.exception() is None
+        save(future.result() if ok else None)
+    future.add_done_callback(write)
+
+#function that stores a still as JPEG file or, during a scan session, as next page of the PDF
+#(settings are taken now, the image may arrive later from the capture thread, None if it failed)
+def still_saver():
+    session, angle, enhance, transform = scan, rotation, enhancer, still_transform()
+    if session is not None:
+        session.reserve() # Sitzung wird erst nach dieser Seite abgeschlossen
+    def save(data):
+        global scan_pages
+        if not data:
+            if session is not None:
+                session.cancel()
+        elif session is not None: # Drehung als /Rotate der Seite statt EXIF
+            if session.put(data, angle, enhance.apply_jpeg if enhance is not None else None, reserved=True) and session is scan:
+                scan_pages += 1
+                logging.debug('scan: page {} added...'.format(scan_pages))
+        else:
+            logging.debug('saving image {}...'.format(writer.save(data, transform=transform)))
+    return save
+
+#scan session on/off: stills are collected as pages of one PDF file
+def toggle_scan():
+    global scan, scan_pages
+    if scan is not None:
+        scan.close()
+        logging.debug('scan: {} pages to {}'.format(scan_pages, scan.path))
+        scan = None
+        pygame.display.set_caption(str("Elmo UI v" + version))
+        return
+    import elmoPdf # erst bei Bedarf laden
+    scan = elmoPdf.PdfWriter(elmoWriter.unique_filename(writer.directory, 'elmo_scan', '.pdf'))
+    scan.start()
+    scan_pages = 0
+    pygame.display.set_caption('Elmo UI v{} - Scan: Ctrl+S adds page, Ctrl+P finishes PDF'.format(version))
+
+#processing of saved stills in the writer thread: enhancement in full resolution and
+#rotation as EXIF orientation tag (camera JPEG unchanged), None if nothing to do
+def still_transform():
+    steps = []
+    if enhancer is not None:
+        steps.append(enhancer.apply_jpeg)
+    if rotation:
+        import elmoJpeg
+        steps.append(functools.partial(elmoJpeg.set_orientation, rotation=rotation))
+    if not steps:
+        return None
+    return lambda data: functools.reduce(lambda d, step: step(d), steps, data)
+
+#rotate the image clockwise, applied by the decoder after downscaling
+def set_rotation(degrees):
+    global rotation
+    rotation = degrees % 360
+    for pipeline in cameras:
+        pipeline.decoder.rotation = rotation
+        pipeline.decoder.invalidate() # gedrehtes Bild auch bei unverändertem Dokument
+    scrub(0)
 
 #reduce source to display resolution
 def reduce_to_screen_size(image, disp_info):
@@ -257,6 +334,20 @@ def reduce_to_screen_size(image, disp_info):
         max_height = (max_width/im_format[0])*im_format[1]
     return [int(max_width), int(max_height)]
 
+#placeholder shown until the first image arrives, window size is derived from it
+def placeholder_image(text):
+    image = pygame.Surface(PLACEHOLDER_SIZE)
+    image.fill(DGRAY)
+    rendered_text = get_font(basic_font, 64).render(text, True, LGRAY)
+    image.blit(rendered_text, rendered_text.get_rect(center=image.get_rect().center))
+    return image
+
+#note time of a startup step (seconds since STARTED), only the first call per step counts
+def mark_startup(step):
+    if step not in startup_times:
+        startup_times[step] = time.perf_counter()-STARTED
+        logging.debug('startup: {} after {:.3f} s'.format(step, startup_times[step]))
+
 def render_textrect(string, font, rect, text_color, background_color, justification=0):
     """Returns a surface containing the passed text string, reformatted to fit within the given rect, word-wrapping as necessary.
     The text will be anti-aliased. Author: David Clark, siehe https://www.pygame.org/pcr/text_rect/index.php
@@ -307,6 +398,158 @@ def render_textrect(string, font, rect, text_color, background_color, justificat
     return surface
 
 
+#send a camera command via the capture thread, returns a Future and never blocks the UI
+def command(name, *args):
+    if capture is not None:
+        return capture.commands.submit(name, *args)
+
+#record a series of frames at full frame rate into a new directory
+def start_burst(count):
+    if capture is None: return
+    path = elmoWriter.unique_filename(writer.directory, 'elmo_burst', '')
+    recorders.append(elmoWriter.Recorder(capture, elmoWriter.SequenceWriter(path, 'elmo_burst'), count=count))
+    logging.debug('burst: {} frames to {}'.format(count, path))
+
+#time-lapse on/off, one frame per interval into a single .mjpeg file
+def toggle_timelapse(interval):
+    global timelapse
+    if timelapse is not None:
+        timelapse.stop()
+        timelapse = None
+    elif capture is not None:
+        path = elmoWriter.unique_filename(writer.directory, 'elmo_timelapse', '.mjpeg')
+        timelapse = elmoWriter.Recorder(capture, elmoWriter.SequenceWriter(path), interval=interval)
+        recorders.append(timelapse)
+        logging.debug('time-lapse to {}'.format(path))
+
+#show camera number i, cam/capture/decoder always refer to the visible camera
+def select_camera(i):
+    global cam, capture, decoder, active_camera, frame_seq
+    if not cameras: return
+    active_camera = i % len(cameras)
+    pipeline = cameras[active_camera]
+    cam, capture, decoder = pipeline.cam, pipeline.capture, pipeline.decoder
+    for p in cameras: # nur sichtbare Kameras decodieren
+        p.decoder.paused = not (tiled or p is pipeline)
+        p.decoder.invalidate()
+        p.seq = 0
+    frame_seq = 0
+    if renderer is not None:
+        renderer.invalidate()
+    logging.debug('camera {} of {} selected'.format(active_camera+1, len(cameras)))
+
+#switch between single camera and tiled view of all cameras
+def toggle_tiled():
+    global tiled, mosaic
+    tiled = not tiled and len(cameras) > 1
+    mosaic = None
+    if screen is not None: # Zielgröße vor dem Decodieren festlegen, nicht erst mit dem nächsten Bild
+        set_decode_sizes(screen.get_size())
+    select_camera(active_camera)
+
+#target size of the decoder threads: tile size in tiled view, otherwise window size
+def set_decode_sizes(screen_size):
+    if tiled:
+        rects = tile_rects(screen_size, len(cameras))
+        for pipeline, rect in zip(cameras, rects):
+            pipeline.decoder.screen_size = rect.size # jede Kamera direkt in Kachelgröße decodieren
+        return rects
+    for pipeline in cameras:
+        pipeline.decoder.screen_size = screen_size
+    return None
+
+#grid of tiles for n cameras
+def tile_rects(screen_size, n):
+    cols = int(math.ceil(math.sqrt(n)))
+    rows = int(math.ceil(n/cols))
+    width, height = screen_size[0]//cols, screen_size[1]//rows
+    return [pygame.Rect((i%cols)*width, (i//cols)*height, width, height) for i in range(n)]
+
+#compose newest images of all cameras, returns None if no camera delivered a new image
+def update_tiles(screen_size):
+    global mosaic
+    rects = set_decode_sizes(screen_size)
+    changed = mosaic is None or mosaic.get_size() != tuple(screen_size)
+    for pipeline, rect in zip(cameras, rects):
+        pipeline.seq, tile = pipeline.decoder.slot.get(pipeline.seq, 0)
+        if tile is not None:
+            pipeline.tile = tile
+            changed = True
+    if not changed:
+        return None
+    mosaic = pygame.Surface(screen_size)
+    mosaic.fill(BLACK)
+    for pipeline, rect in zip(cameras, rects):
+        if pipeline.tile is not None:
+            tile = pipeline.tile
+            if tile.get_width() > rect.width or tile.get_height() > rect.height:
+                tile = pygame.transform.smoothscale(tile, elmoDecode.fit_size(tile.get_size(), rect.size))
+            mosaic.blit(tile, tile.get_rect(center=rect.center))
+    return mosaic
+
+#freeze on/off: show the newest buffered frame instead of the live image
+def toggle_freeze():
+    global frozen, frozen_index, frozen_changed
+    if frozen is not None or not cameras:
+        frozen = None
+        select_camera(active_camera) # Livebild wieder anzeigen
+        pygame.display.set_caption(str("Elmo UI v" + version))
+        return
+    if tiled:
+        toggle_tiled()
+    frozen = cameras[active_camera].ring.frames()
+    if not frozen:
+        frozen = None
+        return
+    frozen_index = len(frozen)-1
+    frozen_changed = True
+
+#document enhancement: off > enhanced > black/white > off
+def toggle_enhance():
+    global enhancer
+    try:
+        import elmoEnhance
+    except ImportError:
+        logging.warning('document enhancement needs NumPy...')
+        return
+    if enhancer is None:
+        enhancer = elmoEnhance.Enhancer()
+    elif not enhancer.bw:
+        enhancer = elmoEnhance.Enhancer(bw=True)
+    else:
+        enhancer = None
+    for pipeline in cameras:
+        pipeline.decoder.enhancer = enhancer
+        pipeline.decoder.invalidate()
+    scrub(0) # Standbild neu decodieren
+    logging.debug('enhancement: {}'.format('off' if enhancer is None else 'b/w' if enhancer.bw else 'on'))
+
+#step through buffered frames while frozen
+def scrub(step):
+    global frozen_index, frozen_changed
+    if frozen is None: return
+    frozen_index = max(0, min(len(frozen)-1, frozen_index+step))
+    frozen_changed = True
+
+#switch automatic jpg-quality on/off, manual quality is restored when switched off
+def set_auto_quality(on):
+    global manual_compression
+    if capture is None or on == (capture.controller is not None):
+        return
+    if on:
+        manual_compression = cam.getCompression()
+        capture.controller = elmoCapture.CompressionController(cam)
+    else:
+        capture.controller = None
+        cam.setCompression(manual_compression)
+    logging.debug('auto quality: {}'.format(on))
+
+#True if the mouse is on button name, buttons missing from the current menu
+#(e.g. camera buttons while connecting or with hidden menu) are never pressed
+def button_pressed(name):
+    button = buttons.get(name)
+    return button is not None and button.pressed(pygame.mouse.get_pos())
+
 ##########
 # events #
 ##########
@@ -317,14 +560,19 @@ def events():
     global error_no_elmo
     global screen
     global image
-    global rotate
     global display_help
     global display_menue
     global image_size
     global buttons
     global ui_running
     
+    redraw = False # True falls Fenster neu gezeichnet werden muss
     for event in pygame.event.get():        
+        if event.type != pygame.MOUSEMOTION:
+            redraw = True
+        if event.type == pygame.VIDEORESIZE and decoder is not None:
+            decoder.invalidate() # Bild in neuer Fenstergröße decodieren
+            scrub(0)
         if event.type == pygame.QUIT: # close program event
             ui_running = False
         
@@ -334,7 +582,9 @@ def events():
                 ui_running = False    
             #rotate display
             if (event.key == pygame.K_t and pygame.K_LCTRL) or (event.key == pygame.K_t and pygame.K_RCTRL):
-                rotate = not rotate
+                set_rotation(rotation+180)
+            if (event.key == pygame.K_r and pygame.K_LCTRL) or (event.key == pygame.K_r and pygame.K_RCTRL):
+                set_rotation(rotation+90)
             #display help
             if (event.key == pygame.K_h and pygame.K_LCTRL) or (event.key == pygame.K_h and pygame.K_RCTRL) or event.key == pygame.K_F1:
                 display_help = not display_help
@@ -344,6 +594,29 @@ def events():
             #Aktuelles Bild als jpg-Datei speichern
             if (event.key == pygame.K_s and pygame.K_LCTRL) or (event.key == pygame.K_s and pygame.K_RCTRL):
                 save_image_to_file(cam)
+            #Scan-Sitzung: Einzelbilder als Seiten einer PDF-Datei
+            if (event.key == pygame.K_p and pygame.K_LCTRL) or (event.key == pygame.K_p and pygame.K_RCTRL):
+                toggle_scan()
+            #Dokumentaufbereitung
+            if (event.key == pygame.K_e and pygame.K_LCTRL) or (event.key == pygame.K_e and pygame.K_RCTRL):
+                toggle_enhance()
+            #Standbild und Zurückspulen im Ringpuffer
+            if (event.key == pygame.K_f and pygame.K_LCTRL) or (event.key == pygame.K_f and pygame.K_RCTRL):
+                toggle_freeze()
+            if event.key == pygame.K_LEFT:
+                scrub(-1)
+            if event.key == pygame.K_RIGHT:
+                scrub(1)
+            #Kamera wechseln bzw. alle Kameras anzeigen
+            if (event.key == pygame.K_n and pygame.K_LCTRL) or (event.key == pygame.K_n and pygame.K_RCTRL):
+                select_camera(active_camera+1)
+            if (event.key == pygame.K_w and pygame.K_LCTRL) or (event.key == pygame.K_w and pygame.K_RCTRL):
+                toggle_tiled()
+            #Bildserie bzw. Zeitraffer aufnehmen
+            if (event.key == pygame.K_b and pygame.K_LCTRL) or (event.key == pygame.K_b and pygame.K_RCTRL):
+                start_burst(BURST_FRAMES)
+            if (event.key == pygame.K_l and pygame.K_LCTRL) or (event.key == pygame.K_l and pygame.K_RCTRL):
+                toggle_timelapse(TIMELAPSE_INTERVAL)
             #exit help with escape
             if event.key == pygame.K_ESCAPE and display_help == True:
                 display_help = False
@@ -351,59 +624,69 @@ def events():
             if error_no_elmo == False:
                 #zoom in
                 if (event.key == pygame.K_c and pygame.K_LCTRL) or (event.key == pygame.K_c and pygame.K_RCTRL):
-                    cam.zoom(1)
+                    command('zoom', 1)
                 #zoom out
                 if (event.key == pygame.K_v and pygame.K_LCTRL) or (event.key == pygame.K_v and pygame.K_RCTRL):
-                    cam.zoom(-1)
+                    command('zoom', -1)
                 #brightness up
                 if (event.key == pygame.K_d and pygame.K_LCTRL) or (event.key == pygame.K_d and pygame.K_RCTRL):
-                    cam.brightness(1)
+                    command('brightness', 1)
                 #brightness down
                 if (event.key == pygame.K_x and pygame.K_LCTRL) or (event.key == pygame.K_x and pygame.K_RCTRL):
-                    cam.brightness(-1)                
+                    command('brightness', -1)                
                 #reset brightness
                 if (event.key == pygame.K_g and pygame.K_LCTRL) or (event.key == pygame.K_g and pygame.K_RCTRL):
-                    cam.brightness(0)
+                    command('brightness', 0)
                 #autofocus
                 if (event.key == pygame.K_a and pygame.K_LCTRL) or (event.key == pygame.K_a and pygame.K_RCTRL):
-                    cam.autofocus()
+                    command('autofocus')
                 #quality up
                 if (event.key == pygame.K_u and pygame.K_LCTRL) or (event.key == pygame.K_u and pygame.K_RCTRL):
+                    set_auto_quality(False)
                     cam.setCompression(5, False)
                 #quality down
                 if (event.key == pygame.K_z and pygame.K_LCTRL) or (event.key == pygame.K_z and pygame.K_RCTRL):
+                    set_auto_quality(False)
                     cam.setCompression(-5, False)
+                #automatic quality
+                if (event.key == pygame.K_o and pygame.K_LCTRL) or (event.key == pygame.K_o and pygame.K_RCTRL):
+                    set_auto_quality(capture is not None and capture.controller is None)
         
         elif event.type == MOUSEBUTTONDOWN: # Bei Mausklick
             # prüfen ob Mauszeiger im entsprechenden Button-Rechteck
-            if buttons['exit'].pressed(pygame.mouse.get_pos()):
+            if button_pressed('exit'):
                 ui_running = False
-            if buttons['help'].pressed(pygame.mouse.get_pos()):
+            if button_pressed('help'):
                 display_help = not display_help
-            if buttons['menue'].pressed(pygame.mouse.get_pos()):
+            if button_pressed('menue'):
                 display_menue = not display_menue
-            if buttons['rotate'].pressed(pygame.mouse.get_pos()):
-                rotate = not rotate
-            if buttons['save'].pressed(pygame.mouse.get_pos()):
+            if button_pressed('rotate'):
+                set_rotation(rotation+180)
+            if button_pressed('save'):
                 save_image_to_file(cam)
             #ELMO-Functions like zoom, brightness, focus
             if error_no_elmo == False:
-                if buttons['zoom_in'].pressed(pygame.mouse.get_pos()):
-                    cam.zoom(1)
-                if buttons['zoom_out'].pressed(pygame.mouse.get_pos()):
-                    cam.zoom(-1)
-                if buttons['brightness_reset'].pressed(pygame.mouse.get_pos()):
-                    cam.brightness(0)
-                if buttons['brightness_up'].pressed(pygame.mouse.get_pos()):
-                    cam.brightness(1)
-                if buttons['brightness_down'].pressed(pygame.mouse.get_pos()):
-                    cam.brightness(-1)
-                if buttons['focus_auto'].pressed(pygame.mouse.get_pos()):
-                    cam.autofocus()
-                if buttons['quality_up'].pressed(pygame.mouse.get_pos()):
+                if button_pressed('zoom_in'):
+                    command('zoom', 1)
+                if button_pressed('zoom_out'):
+                    command('zoom', -1)
+                if button_pressed('brightness_reset'):
+                    command('brightness', 0)
+                if button_pressed('brightness_up'):
+                    command('brightness', 1)
+                if button_pressed('brightness_down'):
+                    command('brightness', -1)
+                if button_pressed('focus_auto'):
+                    command('autofocus')
+                if button_pressed('quality_up'):
+                    set_auto_quality(False)
                     cam.setCompression(5, False)
-                if buttons['quality_down'].pressed(pygame.mouse.get_pos()):
+                if button_pressed('quality_down'):
+                    set_auto_quality(False)
                     cam.setCompression(-5, False)
+                if button_pressed('quality_auto'):
+                    set_auto_quality(capture is not None and capture.controller is None)
+    return redraw
 
 
 
@@ -420,11 +703,7 @@ class Button:
         return surface
 
     def write_text(self, surface, text, text_color, length, height, x, y, font, font_size, bold):
-        myFont = pygame.font.SysFont(font, font_size)
-        if bold:
-            myFont.set_bold(1)
-        else:
-            myFont.set_bold(0)
+        myFont = get_font(font, font_size, bold)
         myText = myFont.render(text, 1, text_color)
         surface.blit(myText, ((x+length/2) - myText.get_width()/2, (y+height/2) - myText.get_height()/2))
         return surface
@@ -455,133 +734,347 @@ class Button:
         else: return False
 
 
-#################
-# main-function #
-#################
-#################################
-# initialisation of ELMO device #
-#################################
-if error_no_elmo == True:
-    try:    
-        logging.debug('# of displays: {}'.format(pygame.display.get_num_displays()))
-        logging.debug('display size:{}x{}'.format(disp_info.current_w,disp_info.current_h))
-        cam = elmoCam.Elmo()
-        cam_connect = cam.connect() # bei Testbetrieb auskommentieren
-        if cam_connect == -1:
-            error_no_elmo = True
-        else:
-            error_no_elmo = False
-        #error_no_elmo = False # Testbetrieb
-    except:
-        logging.warning('No Elmo camera found...')
-        error_no_elmo = True
-
-
-while ui_running:
-    logging.debug('new frame...')
-#    #################################
-#    # initialisation of ELMO device #
-#    #################################
-#    if error_no_elmo == True:
-#        try:    
-#            logging.debug('# of displays: {}'.format(pygame.display.get_num_displays()))
-#            logging.debug('display size:{}x{}'.format(disp_info.current_w,disp_info.current_h))
-#            cam = elmoCam.Elmo()
-#            cam_connect = cam.connect() # bei Testbetrieb auskommentieren
-#            if cam_connect == -1:
-#                error_no_elmo = True
-#            else:
-#                error_no_elmo = False
-#            #error_no_elmo = False # Testbetrieb
-#        except:
-#            logging.warning('No Elmo camera found...')
-#            error_no_elmo = True
-              
-    events() # check for pygame events
-        
-    try: #clear background
-        logging.debug('clear background...')
-        background = pygame.Surface(screen.get_size())
-        background = background.convert()
-        background.fill(BLACK)
-        screen.blit(background, (0, 0))
-    except:
-        pass
-    
-    try: # Bild via USB einlesen und umformen
-        logging.debug('get new image...')
-        data = cam.get_image() # Bilddaten als Byte Array einlesen
-        #error_no_elmo = False
-        stream = BytesIO(data) # Byte-Stream aus data erzeugen - wie eine Datei einlesbar
-        error_no_image = False
-        image_new = pygame.image.load(stream) # neues Bild in pyGame einlesen                                      
-    except:
-        logging.warning('exeption get new image...')
-        error_no_image = True
-  
-    if error_no_image == False: # falls kein neues Bild, das vorherige verwenden
-        image = image_new
-
-    if image != None:            
-        if screen is None: # init display on startup if not set
-            start_size = reduce_to_screen_size(image, disp_info)
-            screen = pygame.display.set_mode(start_size,RESIZABLE, display=0) # Screen auf Monitor 1 (display=0)
-            pygame.display.set_caption(str("Elmo UI v" + version)) #set msg of the window
-            image_size = image.get_size()
-            
-        if (rotate and (not error_no_image)): # neues Bild 180° rotieren falls Flag durch Rotate Button gesetzt
-            logging.debug('rotate image...')
-            image = pygame.transform.flip(image, True, True)
-        
-        # Bei Änderung Fenstergröße Bild entsprechend skalieren
-        image_size = resize_image(image, screen) # Bildgröße berechnen
-        image = pygame.transform.smoothscale(image, image_size) # Bild skalieren
-        logging.debug('Image resized...')
-        screen.blit(image, get_image_padding(image,screen)) # Bild im pyGame-Fenster darstellen
-        
-        if display_help: # help-Fenster anzeigen
-            screen = draw_help(screen, screen.get_size(), version, basic_font, DGRAY, LGRAY) 
-        
-        if display_menue: # Menü anzeigen
-            buttons = draw_menue(screen, screen.get_size(), buttons, error_no_elmo, basic_font, DGRAY, LGRAY)
-        
-        if error_no_image: # display error massage when no image is delivered
-            logging.debug('error_no_image...')
+class OverlayCache:
+    ''' Menü, Hilfe und Fehlermeldung werden nur bei Änderung von Fenstergröße, Kamerastatus
+    oder Sichtbarkeit neu gezeichnet und sonst als fertige Surfaces auf das Bild geblittet.'''
+    def __init__(self):
+        self.key = None
+        self.layers = [] # Liste aus (Surface, Position)
+        self.buttons = {}
+        self.banner_key = None
+        self.banner = None
+
+    def get(self, screen_size, error_no_elmo, display_menue, display_help):
+        key = (tuple(screen_size), error_no_elmo, display_menue, display_help)
+        if key != self.key:
+            logging.debug('OverlayCache: rebuild overlays...')
+            self.key = key
+            self.layers = []
+            if display_help:
+                surface = pygame.Surface(screen_size, pygame.SRCALPHA)
+                draw_help(surface, screen_size, version, basic_font, DGRAY, LGRAY)
+                self._add_layer(surface, [surface.get_bounding_rect()])
+            if display_menue:
+                surface = pygame.Surface(screen_size, pygame.SRCALPHA)
+                self.buttons = draw_menue(surface, screen_size, {}, error_no_elmo, basic_font, DGRAY, LGRAY)
+                # je eine Schicht für linke und rechte Button-Spalte inkl. Schatten
+                left = [b.rect for b in self.buttons.values() if b.rect.x == 0]
+                right = [b.rect for b in self.buttons.values() if b.rect.x != 0]
+                self._add_layer(surface, [r[0].unionall(r).inflate(20, 20) for r in (left, right) if r])
+        return self.layers, self.buttons
+
+    def _add_layer(self, surface, rects):
+        for rect in rects:
+            rect = rect.clip(surface.get_rect())
+            if rect.width and rect.height:
+                self.layers.append((surface.subsurface(rect).copy(), rect.topleft))
+
+    def get_banner(self, screen_size):
+        ''' Fehlermeldung "No image from camera" als (Surface, Rect) oder (False, Rect)'''
+        if self.banner_key != tuple(screen_size):
+            self.banner_key = tuple(screen_size)
             string = "\n  No image from camera.  "
             #calculating the box size
-            temp_font_size = int((screen.get_size()[0]/6)/2)
+            temp_font_size = int((screen_size[0]/6)/2)
             temp_width = temp_font_size * 3
             temp_height = temp_font_size * 0.75
-            #print the box on the screen
             fits=False
             rendered_text = False
             while not fits:
                 try:
                     textRect = pygame.Rect((0, 0, temp_width, temp_height))
-                    textRect.centerx = screen.get_rect().centerx
-                    rendered_text = render_textrect(string, pygame.font.SysFont(basic_font, temp_font_size-1), textRect, RED, DGRAY, 0)
+                    textRect.centerx = screen_size[0]//2
+                    rendered_text = render_textrect(string, get_font(basic_font, temp_font_size-1), textRect, RED, DGRAY, 0)
                     fits = True
                 except:
                     temp_font_size = temp_font_size - 1
                     if temp_font_size == 0: fits = True
-            if rendered_text:
-                screen.blit(rendered_text, textRect)        
+            self.banner = (rendered_text, textRect)
+        return self.banner
+
+
+class CameraPipeline:
+    ''' Eine Kamera mit eigenem Capture- und Decode-Thread, mehrere Kameras laufen parallel.
+    capture ersetzt den Capture-Thread, z.B. elmoBus.BusCapture für Bilder eines elmoBus-Dienstes.'''
+    def __init__(self, cam, capture=None):
+        self.cam = cam
+        self.capture = capture if capture is not None else elmoCapture.CaptureThread(cam)
+        self.decoder = elmoDecode.DecodeThread(self.capture.slot)
+        self.decoder.detector = elmoDecode.ChangeDetector() # unveränderte Dokumente nicht neu darstellen
+        self.ring = elmoCapture.FrameRing() # letzte Bilder für Standbild/Zurückspulen
+        self.capture.add_listener(self.ring.add)
+        self.seq = 0 # Nummer des zuletzt übernommenen Bildes (Kachelansicht)
+        self.tile = None # zuletzt übernommenes Bild (Kachelansicht)
+
+    def start(self):
+        self.capture.start()
+        self.decoder.start()
+
+    def stop(self):
+        self.decoder.stop()
+        self.capture.stop()
+        self.capture.join(1)
+
+
+class StartupThread(threading.Thread):
+    ''' Verbindet die Kameras im Hintergrund (inkl. USB-Reset) und startet deren Bildaufnahme,
+    das Fenster ist währenddessen bereits offen und bedienbar. Das Ergebnis übernimmt die
+    Hauptschleife aus cameras, sobald der Thread beendet ist.'''
+    def __init__(self, args, screen_size):
+        threading.Thread.__init__(self, name='ElmoStartup', daemon=True)
+        self.args = args
+        self.screen_size = screen_size # erstes Bild direkt in Fenstergröße decodieren
+        self.cameras = []
+
+    def run(self):
+        try:
+            if self.args.bus: # Kamera gehört dem Dienst elmoBus, hier nur Client
+                import elmoBus
+                cam = elmoBus.BusCamera(self.args.bus)
+                self.cameras.append(CameraPipeline(cam, elmoBus.BusCapture(cam)))
+            else:
+                import elmoCam # pyusb erst hier laden, nicht vor dem Öffnen des Fensters
+                cam = elmoCam.Elmo()
+                if self.args.sim: # simulierte Kamera, z.B. für --startup-time ohne Elmo
+                    import elmoSim
+                    cam.connect(device=elmoSim.SimulatedElmo())
+                    self.cameras.append(CameraPipeline(cam))
+                elif cam.test: # Testbetrieb ohne Elmo
+                    cam.connect()
+                    self.cameras.append(CameraPipeline(cam))
+                else: # je angeschlossener Elmo eine eigene Instanz mit eigenem Capture-Thread
+                    for device in elmoCam.find_all():
+                        elmo = elmoCam.Elmo()
+                        if elmo.connect(device=device) != -1:
+                            self.cameras.append(CameraPipeline(elmo))
+            logging.debug('{} camera(s) found'.format(len(self.cameras)))
+        except:
+            logging.warning('No Elmo camera found...')
+            self.cameras = []
+        if not self.cameras:
+            return
+        mark_startup('connected')
+        for i, pipeline in enumerate(self.cameras): # Bildaufnahme sofort starten, nur erste Kamera decodieren
+            pipeline.capture.add_listener(lambda seq, frame: mark_startup('first_frame'))
+            pipeline.decoder.screen_size = self.screen_size
+            pipeline.decoder.paused = i > 0
+            pipeline.start()
+
+
+class Renderer:
+    ''' Zeichnet Bild und Overlays ins Fenster und aktualisiert nur geänderte Bereiche.
+    Bei neuem Bild werden nur Bildbereich und darüber liegende Overlays neu gezeichnet,
+    bei Änderung von Fenstergröße, Bildgröße oder Overlays das ganze Fenster.'''
+    def __init__(self):
+        self.full = True # nächstes Mal ganzes Fenster zeichnen
+        self.image_rect = None
+        self._key = None # (Fenstergröße, Bildgröße) für die image_rect berechnet wurde
+        self._overlays = None
+
+    def invalidate(self):
+        self.full = True
+
+    def draw(self, screen, image, overlays, new_image):
+        ''' overlays: Liste aus (Surface, Position) über dem Bild'''
+        key = (screen.get_size(), image.get_size())
+        if key != self._key: # Rand (Letterbox) nur bei Größenänderung neu berechnen
+            self._key = key
+            self.image_rect = image.get_rect(topleft=get_image_padding(image, screen))
+            self.full = True
+        if overlays != self._overlays:
+            self._overlays = overlays
+            self.full = True
+        if self.full:
+            region = screen.get_rect()
+        elif new_image:
+            rects = [surface.get_rect(topleft=pos) for surface, pos in overlays]
+            region = self.image_rect.unionall([r for r in rects if r.colliderect(self.image_rect)])
+        else:
+            return
+        screen.set_clip(region)
+        screen.fill(BLACK, region)
+        screen.blit(image, self.image_rect) # Bild im pyGame-Fenster darstellen
+        screen.blits(overlays, doreturn=False)
+        screen.set_clip(None)
+        pygame.display.update(region)
+        self.full = False
+
+
+#################
+# main-function #
+#################
+def main(argv=None):
+    global disp_info, screen, image, image_size, screen_res, error_no_elmo, error_no_image
+    global overlay, renderer, writer, startup, frame_seq, frozen_changed, buttons, ui_running
+    parser = argparse.ArgumentParser(description='Benutzeroberfläche für Elmo L-12 Dokumentenkamera')
+    parser.add_argument('--bus', default=None, help='Bilder vom elmoBus-Dienst dieses Namens statt direkt über USB')
+    parser.add_argument('--sim', action='store_true', help='simulierte Kamera (elmoSim) statt USB')
+    parser.add_argument('--startup-time', action='store_true', help='nach dem ersten Bild beenden und Startzeiten als JSON-Zeile ausgeben')
+    args = parser.parse_args(argv)
+    # Nachfolgende Zeile für Debugmeldungen ausschalten (level=0 bedeutet alle Meldungen)
+    # DEBUG 10, INFO 20, WARNING 30
+    logging.basicConfig(level=logging.WARNING)
+    #logging.basicConfig(filename='logDatei.log', level=logging.WARNING)
+    mark_startup('imports')
+
+    pygame.display.init() # nur Anzeige und Schrift, pygame.init() startet auch Audio/Joystick (langsam)
+    pygame.font.init()
+    disp_info = pygame.display.Info()
+    logging.debug('# of displays: {}'.format(pygame.display.get_num_displays()))
+    logging.debug('display size:{}x{}'.format(disp_info.current_w,disp_info.current_h))
+    image = placeholder_image('Connecting to camera...') # Fenster sofort öffnen, Bild folgt
+    screen = pygame.display.set_mode(reduce_to_screen_size(image, disp_info), RESIZABLE, display=0) # Screen auf Monitor 1 (display=0)
+    pygame.display.set_caption(str("Elmo UI v" + version)) #set msg of the window
+    error_no_image = False # Meldung "No image" erst, wenn eine Kamera verbunden ist
+    overlay = OverlayCache()
+    renderer = Renderer()
+    layers, buttons = overlay.get(screen.get_size(), error_no_elmo, display_menue, display_help)
+    renderer.draw(screen, pygame.transform.smoothscale(image, resize_image(image, screen)), layers, True)
+    mark_startup('window')
+
+    #################################
+    # initialisation of ELMO device #
+    #################################
+    startup = StartupThread(args, screen.get_size()) # USB-Verbindung und erstes Bild im Hintergrund
+    startup.start()
+    writer = elmoWriter.ImageWriter() # Verzeichnis Screenshots im Arbeitsverzeichnis
+    writer.start()
+
+    while ui_running:
+        logging.debug('new frame...')
+    #    #################################
+    #    # initialisation of ELMO device #
+    #    #################################
+    #    if error_no_elmo == True:
+    #        try:    
+    #            logging.debug('# of displays: {}'.format(pygame.display.get_num_displays()))
+    #            logging.debug('display size:{}x{}'.format(disp_info.current_w,disp_info.current_h))
+    #            cam = elmoCam.Elmo()
+    #            cam_connect = cam.connect() # bei Testbetrieb auskommentieren
+    #            if cam_connect == -1:
+    #                error_no_elmo = True
+    #            else:
+    #                error_no_elmo = False
+    #            #error_no_elmo = False # Testbetrieb
+    #        except:
+    #            logging.warning('No Elmo camera found...')
+    #            error_no_elmo = True
+              
+        redraw = events() # check for pygame events
+
+        if startup is not None and not startup.is_alive(): # Kameras aus dem Hintergrund übernehmen
+            cameras[:] = startup.cameras
+            startup = None
+            error_no_elmo = len(cameras) == 0
+            if error_no_elmo:
+                image = None # Meldung "No Camera found" statt Platzhalter
+                if args.startup_time:
+                    ui_running = False
+            else:
+                select_camera(0)
+            redraw = True
     
-    if error_no_elmo == True or image == None:
-        logging.warning('error_no_elmo...')
-        if screen_res == None:
-            screen_res = [480, 320]
-        screen = pygame.display.set_mode(screen_res,RESIZABLE)
-        pygame.display.set_caption(str("Elmo UI v" + version)) #set msg of the window
-        #create rectangle
-        textRect = pygame.Rect((0, 0, screen_res[0], screen_res[1]))
-        #set rectangle position to middle of the screen
-        textRect.centerx = screen.get_rect().centerx
-        textRect.centery = screen.get_rect().centery       
-        #render the text for the rectangle
-        rendered_text = render_textrect("\n\n    No Camera found    ", pygame.font.SysFont("", 24), textRect, LGRAY, DGRAY, 0)
-        if rendered_text:
-            logging.debug('rendered text...')
-            screen.blit(rendered_text, textRect)
-    pygame.display.update()
-pygame.quit()
+        new_image = False
+        if frozen is not None: # Standbild aus dem Ringpuffer, erst bei Anzeige decodieren
+            if frozen_changed and screen is not None:
+                frozen_changed = False
+                timestamp, data = frozen[frozen_index]
+                image = elmoDecode.decode_jpeg(data, screen.get_size(), enhancer, rotation)
+                new_image = True
+                pygame.display.set_caption('Elmo UI v{} - {:.1f} s'.format(version, timestamp-frozen[-1][0]))
+            else:
+                pygame.time.wait(20)
+        elif decoder is not None:
+            try: # neuestes decodiertes Bild übernehmen
+                logging.debug('get new image...')
+                if screen is not None and not tiled: # Decodierung direkt in Fenstergröße
+                    decoder.screen_size = screen.get_size()
+                if tiled and screen is not None: # alle Kameras nebeneinander
+                    image_new = update_tiles(screen.get_size())
+                    if image_new is None:
+                        pygame.time.wait(20)
+                else:
+                    frame_seq, image_new = decoder.slot.get(frame_seq, 0.02) # max. 20ms warten, damit events() weiter bedient wird
+                if error_no_image != capture.failed:
+                    redraw = True
+                error_no_image = capture.failed
+                recorders[:] = [r for r in recorders if r.active]
+                for pipeline in cameras: # Aufnahmen in voller Rate, nicht sichtbare Kameras seltener abfragen
+                    static = pipeline.decoder.paused or pipeline.decoder.detector.static_frames >= IDLE_FRAMES
+                    pipeline.capture.idle = static and not recorders
+                if image_new is not None:
+                    image = image_new
+                    new_image = True
+            except:
+                logging.warning('exeption get new image...')
+                error_no_image = True
+        else:
+            pygame.time.wait(20) # ohne Kamera nicht in Dauerschleife
+
+        if not (redraw or new_image or screen is None):
+            continue # Bild unverändert: nicht neu zeichnen und kein display.update()
+
+        if image != None:            
+            # Bei Änderung Fenstergröße Bild entsprechend skalieren (neue Bilder kommen bereits passend)
+            image_size = resize_image(image, screen) # Bildgröße berechnen
+            if list(image.get_size()) != image_size and not tiled:
+                image = pygame.transform.smoothscale(image, image_size) # Bild skalieren
+            logging.debug('Image resized...')
+        
+            # Menü und Hilfe aus dem Cache
+            layers, overlay_buttons = overlay.get(screen.get_size(), error_no_elmo, display_menue, display_help)
+            if display_menue:
+                buttons = overlay_buttons
+        
+            if error_no_image: # display error massage when no image is delivered
+                logging.debug('error_no_image...')
+                rendered_text, textRect = overlay.get_banner(screen.get_size())
+                if rendered_text:
+                    layers = layers + [(rendered_text, textRect.topleft)]
+
+            if redraw: # Ereignis (z.B. Fenster verdeckt) > ganzes Fenster neu
+                renderer.invalidate()
+            renderer.draw(screen, image, layers, new_image) # nur geänderte Bereiche aktualisieren
+            if new_image and 'first_display' not in startup_times: # erstes Kamerabild im Fenster
+                mark_startup('first_display')
+                if args.startup_time:
+                    ui_running = False
+    
+        if image == None:
+            logging.warning('error_no_elmo...')
+            if screen_res == None:
+                screen_res = [480, 320]
+            screen = pygame.display.set_mode(screen_res,RESIZABLE)
+            pygame.display.set_caption(str("Elmo UI v" + version)) #set msg of the window
+            #create rectangle
+            textRect = pygame.Rect((0, 0, screen_res[0], screen_res[1]))
+            #set rectangle position to middle of the screen
+            textRect.centerx = screen.get_rect().centerx
+            textRect.centery = screen.get_rect().centery       
+            #render the text for the rectangle
+            rendered_text = render_textrect("\n\n    No Camera found    ", get_font("", 24), textRect, LGRAY, DGRAY, 0)
+            if rendered_text:
+                logging.debug('rendered text...')
+                screen.blit(rendered_text, textRect)
+            pygame.display.update()
+    for recorder in recorders: # laufende Aufnahmen abschließen
+        recorder.stop()
+        recorder.writer.join(5)
+    for pipeline in cameras:
+        pipeline.stop()
+    if scan is not None: # PDF der laufenden Scan-Sitzung abschließen, ohne auf abgebrochene Aufnahmen zu warten
+        scan.close(pending=False)
+        scan.join(5)
+    writer.stop()
+    writer.join(5) # noch ausstehende Bilder schreiben
+    pygame.quit()
+    if args.startup_time: # Zeiten in ms seit Import von elmoUi, fehlende Schritte als null
+        steps = ['imports', 'window', 'connected', 'first_frame', 'first_display']
+        result = {step+'_ms': round(startup_times[step]*1000, 1) if step in startup_times else None for step in steps}
+        result['cameras'] = len(cameras)
+        result['source'] = 'bus' if args.bus else 'sim' if args.sim else 'usb'
+        print(json.dumps(result))
+
+
+if __name__ == '__main__': # nur bei direktem Aufruf, nicht bei Import (z.B. durch elmoBench)
+    main()
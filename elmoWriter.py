@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Speichern der Kamerabilder im Hintergrund.
+Die JPEG-Bytes der Kamera werden unverändert (ohne Decodierung und erneute
+Kompression) in eine Datei geschrieben, das Schreiben erfolgt in einem eigenen
+Thread, so dass Speichern die Darstellung nicht aufhält.
+Für Bildserien und Zeitraffer schreibt SequenceWriter fortlaufend über eine
+begrenzte Warteschlange, Recorder liefert ihm die Bilder des Capture-Threads.
+"""
+
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+
+
+def unique_filename(directory, prefix='elmo_image', ext='.jpg', taken=()):
+    ''' Dateiname mit Datum/Uhrzeit, bei mehreren Bildern pro Sekunde mit Zähler.
+    taken: bereits vergebene, aber evtl. noch nicht geschriebene Dateinamen'''
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(directory, prefix+stamp+ext)
+    i = 1
+    while os.path.exists(path) or path in taken:
+        path = os.path.join(directory, '{}{}_{}{}'.format(prefix, stamp, i, ext))
+        i += 1
+    return path
+
+
+class ImageWriter(threading.Thread):
+    ''' Schreibt JPEG-Bytes im Hintergrund in Dateien im Verzeichnis directory'''
+    def __init__(self, directory="ElmoScreenShots"):
+        threading.Thread.__init__(self, name='ElmoWriter', daemon=True)
+        self.directory = directory
+        self._queue = queue.Queue()
+        self._reserved = set() # vergebene, noch nicht geschriebene Dateinamen
+        self._lock = threading.Lock()
+
+    def save(self, data, path=None, transform=None):
+        ''' Bild zum Schreiben einreihen, liefert den Dateinamen.
+        transform(data) wird vor dem Schreiben im Writer-Thread aufgerufen (z.B. Aufbereitung).'''
+        with self._lock:
+            if path is None:
+                if not os.path.exists(self.directory):
+                    os.makedirs(self.directory)
+                path = unique_filename(self.directory, taken=self._reserved)
+            self._reserved.add(path)
+        self._queue.put((path, data, transform))
+        return path
+
+    def stop(self):
+        ''' Restliche Bilder schreiben und Thread beenden'''
+        self._queue.put(None)
+
+    def run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            path, data, transform = item
+            try:
+                if transform is not None:
+                    data = transform(data)
+                with open(path, 'wb') as f:
+                    f.write(data)
+                logging.debug('elmoWriter: saved {} ({} Bytes)'.format(path, len(data)))
+            except Exception as e:
+                logging.warning('elmoWriter: could not save {}: {}'.format(path, e))
+            finally:
+                with self._lock:
+                    self._reserved.discard(path)
+
+
+class SequenceWriter(threading.Thread):
+    ''' Schreibt eine Bildfolge im Hintergrund, entweder als einzelne Dateien
+    prefix_00000.jpg, prefix_00001.jpg, ... im Verzeichnis path oder, falls path auf
+    .mjpeg endet, in eine Containerdatei (aneinandergehängte JPEG-Bilder, z.B. mit
+    ffmpeg abspielbar). Die Warteschlange ist auf maxsize Bilder begrenzt, bei voller
+    Schlange blockiert put(): kein Bildverlust und kein wachsender Speicher.
+    fsync erfolgt gesammelt alle sync_every Bilder. Scheitert das Anlegen von Datei bzw.
+    Verzeichnis, endet der Thread mit error und put() liefert False statt zu blockieren.'''
+    def __init__(self, path, prefix='frame', maxsize=32, sync_every=16):
+        threading.Thread.__init__(self, name='ElmoSequenceWriter', daemon=True)
+        self.path = path
+        self.prefix = prefix
+        self.container = path.endswith('.mjpeg')
+        self.sync_every = sync_every
+        self.frames = 0 # Anzahl geschriebener Bilder
+        self.error = None # Fehler, mit dem der Thread beendet wurde
+        self._queue = queue.Queue(maxsize)
+
+    def filename(self, index):
+        ''' Dateiname des Bildes Nr. index, steht ohne Prüfung des Verzeichnisses fest'''
+        return os.path.join(self.path, '{}_{:05d}.jpg'.format(self.prefix, index))
+
+    def put(self, data, timeout=0.5):
+        ''' Bild einreihen, bei voller Warteschlange warten solange der Thread schreibt.
+        Liefert False, falls der Thread beendet ist (Bild wird nicht geschrieben).'''
+        while self.error is None:
+            try:
+                self._queue.put(data, timeout=timeout)
+                return True
+            except queue.Full:
+                if not self.is_alive():
+                    break
+        return False
+
+    def close(self):
+        ''' Restliche Bilder schreiben und Thread beenden'''
+        self.put(None)
+
+    def run(self):
+        out = None
+        unsynced = [] # geschriebene, noch nicht per fsync gesicherte Dateien
+        try:
+            if self.container:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                out = open(self.path, 'wb')
+            else:
+                os.makedirs(self.path, exist_ok=True)
+            while True:
+                data = self._queue.get()
+                if data is None:
+                    break
+                try:
+                    if self.container:
+                        out.write(data)
+                    else:
+                        f = open(self.filename(self.frames), 'wb')
+                        f.write(data)
+                        unsynced.append(f)
+                    self.frames += 1
+                    if self.frames % self.sync_every == 0:
+                        self._sync(out if self.container else None, unsynced)
+                except OSError as e:
+                    logging.warning('elmoWriter: could not write frame {}: {}'.format(self.frames, e))
+        except Exception as e: # Datei oder Verzeichnis nicht anlegbar > Aufnahme endet
+            self.error = e
+            logging.warning('elmoWriter: could not write {}: {}'.format(self.path, e))
+        finally:
+            self._sync(out, unsynced)
+            if out is not None:
+                out.close()
+            logging.debug('elmoWriter: {} frames written to {}'.format(self.frames, self.path))
+
+    def _sync(self, out, unsynced):
+        if out is not None:
+            out.flush()
+            os.fsync(out.fileno())
+        for f in unsynced:
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        del unsynced[:]
+
+
+class Recorder:
+    ''' Nimmt Bilder eines CaptureThread (elmoCapture) mit einem SequenceWriter auf:
+    count Bilder in voller Bildrate (Serie) oder, mit interval, ein Bild je interval
+    Sekunden (Zeitraffer) bis stop() bzw. bis count Bilder erreicht sind.'''
+    def __init__(self, capture, writer, count=None, interval=0):
+        self.capture = capture
+        self.writer = writer
+        self.count = count
+        self.interval = interval
+        self.frames = 0
+        self.active = True
+        self._next = 0.0
+        writer.start()
+        capture.add_listener(self._on_frame)
+
+    def _on_frame(self, seq, frame):
+        now = time.monotonic()
+        if not self.active or now < self._next:
+            return
+        self._next = now + self.interval
+        if not self.writer.put(frame): # blockiert bei voller Warteschlange > Kamera wartet, kein Bildverlust
+            logging.warning('elmoWriter: recording stopped after {} frames, writer ended'.format(self.frames))
+            self.stop()
+            return
+        self.frames += 1
+        if self.count is not None and self.frames >= self.count:
+            self.stop()
+
+    def stop(self):
+        if self.active:
+            self.active = False
+            self.capture.remove_listener(self._on_frame)
+            self.writer.close()